@@ -0,0 +1,287 @@
+"""
+Measure compile throughput and tail latency with a fake arduino-cli.
+
+A scripted ``arduino-cli`` (see benchmarks/fake_arduino_cli.py) is put first
+on PATH, then ``--concurrency`` clients repeatedly POST to
+/api/compile-arduino/ until ``--requests`` compiles have been sent.
+
+In-process mode (default) serves the requests through the Django test client
+from a pool of ``--workers`` threads, standing in for gunicorn's worker
+capacity. Queue wait is the time a request waited for a free worker.
+
+Live mode (``--url``) sends the requests to a running server started with the
+fake CLI on its PATH (``python -m benchmarks.fake_arduino_cli --install DIR``).
+Queue wait is estimated as client latency minus the server's Server-Timing
+total. The server's per-user compile limits (COMPILE_RATE, 12/min, and
+COMPILE_MAX_IN_FLIGHT, 1, by default) apply, so with one user most requests
+would just measure 429 responses. Start the server with them
+disabled (``COMPILE_RATE= COMPILE_MAX_IN_FLIGHT=0``), or spread the clients
+across several users with a comma-separated ``--username`` list. Rejected
+requests are reported as ``throttled`` and left out of the throughput and
+latency figures.
+
+Usage (from backend/):
+    python -m benchmarks.compile_throughput --requests 50 --concurrency 8 \\
+        --workers 3 --compile-seconds 1.5 --output-bytes 65536
+    COMPILE_RATE= COMPILE_MAX_IN_FLIGHT=0 gunicorn -c gunicorn.conf.py boardboost_project.wsgi
+    python -m benchmarks.compile_throughput --url http://localhost:8000 \\
+        --username bench --password secret --requests 50 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from .fake_arduino_cli import install
+from .utils import (
+    latency_stats,
+    live_login,
+    setup_django,
+    teardown_django,
+    write_report,
+)
+
+SKETCH = """
+void setup() {
+  pinMode(LED_BUILTIN, OUTPUT);
+}
+
+void loop() {
+  digitalWrite(LED_BUILTIN, HIGH);
+  delay(1000);
+  digitalWrite(LED_BUILTIN, LOW);
+  delay(1000);
+}
+"""
+
+PAYLOAD = {"code": SKETCH, "board_fqbn": "arduino:avr:uno", "upload_method": "download"}
+
+
+class InProcessTarget:
+    """Serve requests through the Django test client on a bounded worker pool."""
+
+    def __init__(self, workers):
+        from django.contrib.auth.models import User
+        from django.test import Client
+
+        user = User.objects.create_user("compile-benchmark", password="benchmark")
+        # Log in once up front: concurrent logins from the pool threads
+        # would contend for the (SQLite) session table
+        login = Client()
+        login.force_login(user)
+        self.cookies = login.cookies
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.local = threading.local()
+
+    def _client(self):
+        if not hasattr(self.local, "client"):
+            from django.test import Client
+
+            self.local.client = Client()
+            self.local.client.cookies.load(self.cookies)
+        return self.local.client
+
+    def _handle(self):
+        started = time.perf_counter()
+        response = self._client().post(
+            "/api/compile-arduino/", PAYLOAD, content_type="application/json"
+        )
+        return started, response.status_code, len(response.content)
+
+    def send(self):
+        submitted = time.perf_counter()
+        started, status, size = self.pool.submit(self._handle).result()
+        finished = time.perf_counter()
+        return {
+            "latency": finished - submitted,
+            "queue_wait": started - submitted,
+            "status": status,
+            "bytes": size,
+        }
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class LiveTarget:
+    """Send requests to a running server with a logged-in session."""
+
+    def __init__(self, url, usernames, password):
+        self.url = url.rstrip("/")
+        self.usernames = usernames
+        self.password = password
+        self.local = threading.local()
+        self.logins = 0
+        self.lock = threading.Lock()
+
+    def _opener(self):
+        if not hasattr(self.local, "opener"):
+            # Each client thread logs in as the next user in turn
+            with self.lock:
+                username = self.usernames[self.logins % len(self.usernames)]
+                self.logins += 1
+            self.local.opener, self.local.csrf = live_login(
+                self.url, username, self.password
+            )
+        return self.local.opener
+
+    def send(self):
+        opener = self._opener()
+        request = urllib.request.Request(
+            f"{self.url}/api/compile-arduino/",
+            data=json.dumps(PAYLOAD).encode(),
+            headers={
+                "Content-Type": "application/json",
+                "X-CSRFToken": self.local.csrf,
+                "Referer": f"{self.url}/",
+            },
+        )
+        submitted = time.perf_counter()
+        try:
+            with opener.open(request) as response:
+                status, body = response.status, response.read()
+                server_timing = response.headers.get("Server-Timing", "")
+        except urllib.error.HTTPError as e:
+            status, body, server_timing = (
+                e.code,
+                e.read(),
+                e.headers.get("Server-Timing", ""),
+            )
+        latency = time.perf_counter() - submitted
+
+        # Queue wait = time not accounted for by the server's own total
+        match = re.search(r"total;dur=([\d.]+)", server_timing)
+        queue_wait = max(latency - float(match.group(1)) / 1000, 0) if match else None
+        return {
+            "latency": latency,
+            "queue_wait": queue_wait,
+            "status": status,
+            "bytes": len(body),
+        }
+
+    def close(self):
+        pass
+
+
+def drive(target, total, concurrency):
+    """Run ``concurrency`` closed-loop clients until ``total`` requests are sent."""
+    results = []
+    lock = threading.Lock()
+    remaining = [total]
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            try:
+                result = target.send()
+            except Exception as e:
+                # Count the request as failed instead of losing the client
+                result = {
+                    "latency": None,
+                    "queue_wait": None,
+                    "status": None,
+                    "error": repr(e),
+                }
+            with lock:
+                results.append(result)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def run(args):
+    connection = None
+    if args.url:
+        # The server must already run with the fake CLI on its PATH
+        target = LiveTarget(args.url, args.username.split(","), args.password)
+    else:
+        # Fake CLI first on PATH for this process and its children
+        fake_dir = tempfile.mkdtemp(prefix="fake-arduino-cli-")
+        install(fake_dir)
+        os.environ["PATH"] = fake_dir + os.pathsep + os.environ["PATH"]
+        os.environ["FAKE_ARDUINO_COMPILE_SECONDS"] = str(args.compile_seconds)
+        os.environ["FAKE_ARDUINO_OUTPUT_BYTES"] = str(args.output_bytes)
+        os.environ["FAKE_ARDUINO_LOG_LINES"] = str(args.log_lines)
+        os.environ["TRACING_ENABLED"] = "False"
+        connection = setup_django()
+        target = InProcessTarget(args.workers)
+
+    try:
+        results, elapsed = drive(target, args.requests, args.concurrency)
+    finally:
+        target.close()
+        if connection is not None:
+            teardown_django(connection)
+
+    ok = [r for r in results if r["status"] == 200]
+    # Rejected by the per-user limits, not served: kept out of the figures
+    throttled = [r for r in results if r["status"] == 429]
+    served = [r for r in results if r["status"] != 429]
+    exceptions = sorted({r["error"] for r in results if "error" in r})
+    waits = [r["queue_wait"] for r in served if r["queue_wait"] is not None]
+    write_report(
+        {
+            "benchmark": "compile_throughput",
+            "config": {
+                "mode": "live" if args.url else "in-process",
+                "url": args.url,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "workers": None if args.url else args.workers,
+                "compile_seconds": None if args.url else args.compile_seconds,
+                "output_bytes": None if args.url else args.output_bytes,
+            },
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else None,
+            "throttled": len(throttled),
+            "errors": len(served) - len(ok),
+            "exceptions": exceptions,
+            "latency": latency_stats(
+                [r["latency"] for r in served if r["latency"] is not None]
+            ),
+            "queue_wait": latency_stats(waits),
+        },
+        args.output,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="in-process worker pool size"
+    )
+    parser.add_argument("--compile-seconds", type=float, default=1.0)
+    parser.add_argument("--output-bytes", type=int, default=32768)
+    parser.add_argument("--log-lines", type=int, default=200)
+    parser.add_argument("--url", help="benchmark a running server instead")
+    parser.add_argument(
+        "--username", help="comma-separated users to spread the clients across"
+    )
+    parser.add_argument("--password")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+    if args.url and not (args.username and args.password):
+        parser.error("--url requires --username and --password")
+    run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Benchmark the chat context pipeline against a fake OpenAI backend.
+
+Seeds conversations of each requested size (with stored embeddings for the
+assistant messages) into a throwaway test database, points the OpenAI
+client at a local fake server and measures latency percentiles, database
+query counts and peak Python memory for:
+
+  - build_context_for_message
+  - find_relevant_messages
+  - POST /api/send-message/ end to end
+
+Usage (from backend/):
+    python -m benchmarks.context_pipeline --sizes 10,100,1000,10000 \\
+        --iterations 20 --latency 0.05 --output before.json
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+import uuid
+
+from .fake_openai import fake_embedding, start_fake_openai
+from .utils import latency_stats, setup_django, teardown_django, write_report
+
+
+def seed_conversation(user, size, embedding_dim, batch_size=500):
+    """Create a project whose conversation holds ``size`` messages."""
+    from chat.models import Conversation, Message, MessageEmbedding, Project
+
+    project = Project.objects.create(
+        name=f"Benchmark {size}", user=user, board_type="Arduino Uno"
+    )
+    conversation = Conversation.objects.create(project=project)
+
+    for start in range(0, size, batch_size):
+        messages = Message.objects.bulk_create(
+            [
+                Message(
+                    conversation=conversation,
+                    sender="user" if i % 2 == 0 else "assistant",
+                    content=f"Message {i}: how do I wire sensor {i % 37} to pin {i % 13}?",
+                )
+                for i in range(start, min(start + batch_size, size))
+            ]
+        )
+        MessageEmbedding.objects.bulk_create(
+            [
+                MessageEmbedding(
+                    message=message,
+                    embedding=fake_embedding(message.content, embedding_dim),
+                )
+                for message in messages
+                if message.sender == "assistant"
+            ]
+        )
+    return project, conversation
+
+
+def measure(func, iterations):
+    """Run ``func`` repeatedly, returning latency, query and memory stats."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    # Warm up caches (model settings, summaries) before measuring
+    func()
+
+    durations = []
+    queries = []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - started)
+        queries.append(len(captured))
+
+    # Memory is measured on a separate run; tracemalloc skews timings
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = latency_stats(durations)
+    stats["queries_min"] = min(queries)
+    stats["queries_max"] = max(queries)
+    stats["peak_memory_kb"] = round(peak / 1024, 1)
+    return stats
+
+
+def run(args):
+    server, base_url = start_fake_openai(
+        latency=args.latency, embedding_dim=args.embedding_dim
+    )
+    connection = setup_django(base_url)
+    try:
+        from django.contrib.auth.models import User
+        from django.test import Client
+
+        from chat.ai_service import build_context_for_message, find_relevant_messages
+
+        user = User.objects.create_user("benchmark", password="benchmark")
+        user.userprofile.tokens_remaining = 10**9
+        user.userprofile.save()
+        client = Client()
+        client.force_login(user)
+        question = "How do I read a temperature sensor on pin 2?"
+
+        results = []
+        for size in args.sizes:
+            project, conversation = seed_conversation(user, size, args.embedding_dim)
+            result = {"messages": size}
+
+            result["build_context_for_message"] = measure(
+                lambda: build_context_for_message(question, conversation.id, user),
+                args.iterations,
+            )
+            result["find_relevant_messages"] = measure(
+                lambda: find_relevant_messages(question, conversation.id),
+                args.iterations,
+            )
+
+            def send():
+                # A fresh key per request, so repeating the same question
+                # isn't answered from send_message's duplicate check
+                response = client.post(
+                    "/api/send-message/",
+                    {"content": question, "project_id": project.id},
+                    content_type="application/json",
+                    HTTP_IDEMPOTENCY_KEY=uuid.uuid4().hex,
+                )
+                assert response.status_code == 200, response.content
+                assert "Idempotent-Replayed" not in response, "reply was replayed"
+
+            result["send_message"] = measure(send, args.iterations)
+            results.append(result)
+            print(f"size={size} done", file=sys.stderr)
+
+        write_report(
+            {
+                "benchmark": "context_pipeline",
+                "config": {
+                    "sizes": args.sizes,
+                    "iterations": args.iterations,
+                    "llm_latency_s": args.latency,
+                    "embedding_dim": args.embedding_dim,
+                    "database": connection.vendor,
+                },
+                "fake_openai_requests": server.stats,
+                "results": results,
+            },
+            args.output,
+        )
+    finally:
+        teardown_django(connection)
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[10, 100, 1000],
+        help="comma separated conversation sizes (messages)",
+    )
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="fake LLM latency in seconds"
+    )
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--output", help="write the JSON report here")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
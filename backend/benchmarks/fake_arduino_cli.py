@@ -0,0 +1,120 @@
+"""
+A scripted stand-in for ``arduino-cli`` used by the compile benchmarks.
+
+Supports the subcommands ArduinoCliService calls:
+
+  arduino-cli compile --fqbn FQBN [--verbose] SKETCH_DIR --output-dir DIR
+  arduino-cli board listall --format json
+  arduino-cli version
+
+Behaviour is controlled through environment variables:
+
+  FAKE_ARDUINO_COMPILE_SECONDS   time a compile takes (default 1.0)
+  FAKE_ARDUINO_OUTPUT_BYTES      size of the produced .hex (default 32768)
+  FAKE_ARDUINO_LOG_LINES         verbose output lines printed (default 200)
+  FAKE_ARDUINO_FAIL_RATE         fraction of compiles that fail (default 0)
+
+Install a wrapper named ``arduino-cli`` into a directory and put it first
+on PATH (from backend/):
+
+    python -m benchmarks.fake_arduino_cli --install /tmp/fake-arduino
+    PATH=/tmp/fake-arduino:$PATH gunicorn -c gunicorn.conf.py ...
+"""
+
+import argparse
+import json
+import os
+import random
+import stat
+import sys
+import time
+
+BOARDS = [
+    {"name": "Arduino Uno", "fqbn": "arduino:avr:uno"},
+    {"name": "Arduino Nano", "fqbn": "arduino:avr:nano"},
+    {"name": "Arduino Mega or Mega 2560", "fqbn": "arduino:avr:mega"},
+    {"name": "Arduino Leonardo", "fqbn": "arduino:avr:leonardo"},
+]
+
+
+def _option(args, name, default=None):
+    if name in args:
+        index = args.index(name)
+        if index + 1 < len(args):
+            return args[index + 1]
+    return default
+
+
+def compile_command(args):
+    fqbn = _option(args, "--fqbn")
+    output_dir = _option(args, "--output-dir")
+    positional = [
+        a
+        for i, a in enumerate(args)
+        if not a.startswith("-")
+        and (i == 0 or args[i - 1] not in ("--fqbn", "--output-dir"))
+    ]
+    if not fqbn or not output_dir or not positional:
+        print("Error: missing --fqbn, --output-dir or sketch path", file=sys.stderr)
+        return 1
+
+    sketch_dir = positional[-1]
+    sketch_name = os.path.basename(os.path.normpath(sketch_dir))
+    time.sleep(float(os.environ.get("FAKE_ARDUINO_COMPILE_SECONDS", "1.0")))
+
+    if random.random() < float(os.environ.get("FAKE_ARDUINO_FAIL_RATE", "0")):
+        print(f"{sketch_name}.ino:1:1: error: fake compile failure", file=sys.stderr)
+        return 1
+
+    for i in range(int(os.environ.get("FAKE_ARDUINO_LOG_LINES", "200"))):
+        print(f"Compiling {sketch_name} for {fqbn}: step {i}")
+
+    size = int(os.environ.get("FAKE_ARDUINO_OUTPUT_BYTES", "32768"))
+    with open(os.path.join(output_dir, f"{sketch_name}.ino.hex"), "wb") as f:
+        f.write(os.urandom(size))
+    print(f"Sketch uses {size} bytes of program storage space.")
+    return 0
+
+
+def board_command(args):
+    if args[:1] == ["listall"]:
+        print(json.dumps({"boards": BOARDS}))
+        return 0
+    print(f"Error: unsupported board command {args}", file=sys.stderr)
+    return 1
+
+
+def install(directory):
+    """Write an executable ``arduino-cli`` wrapper into ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    wrapper = os.path.join(directory, "arduino-cli")
+    with open(wrapper, "w") as f:
+        f.write(
+            f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" "$@"\n'
+        )
+    os.chmod(
+        wrapper, os.stat(wrapper).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+    )
+    return wrapper
+
+
+def main(argv):
+    if argv[:1] == ["--install"]:
+        directory = argv[1] if len(argv) > 1 else "fake-arduino-cli"
+        print(install(directory))
+        return 0
+    if argv[:1] == ["compile"]:
+        return compile_command(argv[1:])
+    if argv[:1] == ["board"]:
+        return board_command(argv[1:])
+    if argv[:1] == ["version"]:
+        print("arduino-cli  Version: fake")
+        return 0
+
+    parser = argparse.ArgumentParser(prog="arduino-cli (fake)", description=__doc__)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
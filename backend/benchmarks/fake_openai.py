@@ -0,0 +1,181 @@
+"""
+A tiny local stand-in for the OpenAI REST API, for benchmarks and load tests.
+
+It answers ``/v1/chat/completions`` and ``/v1/embeddings`` after a
+configurable delay, with deterministic embeddings and token usage derived
+from the request size. Point the app at it with ``OPENAI_BASE_URL``.
+
+Run standalone (from backend/):
+    python -m benchmarks.fake_openai --port 8765 --latency 0.5
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIM = 1536
+
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """Deterministic unit vector for a piece of text."""
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    vector = rng.standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        # Latency with optional jitter
+        delay = config["latency"]
+        if config["jitter"]:
+            delay += random.uniform(0, config["jitter"])
+        time.sleep(delay)
+
+        if config["error_rate"] and random.random() < config["error_rate"]:
+            return self._send(500, {"error": {"message": "fake server error"}})
+
+        if self.path.endswith("/chat/completions"):
+            payload = self._chat_completion(body)
+        elif self.path.endswith("/embeddings"):
+            payload = self._embeddings(body)
+        else:
+            return self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        with self.server.stats_lock:
+            self.server.stats[self.path] = self.server.stats.get(self.path, 0) + 1
+        self._send(200, payload)
+
+    def _chat_completion(self, body):
+        config = self.server.config
+        prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+        content = "Here is an example sketch:\n\n```cpp\nvoid setup() {}\nvoid loop() {}\n```\n"
+        content += "x" * max(config["completion_chars"] - len(content), 0)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _embeddings(self, body):
+        inputs = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dim = self.server.config["embedding_dim"]
+        return {
+            "object": "list",
+            "model": body.get("model", "fake"),
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": fake_embedding(text, dim),
+                }
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_fake_openai(
+    host="127.0.0.1",
+    port=0,
+    latency=0.0,
+    jitter=0.0,
+    error_rate=0.0,
+    completion_chars=800,
+    embedding_dim=EMBEDDING_DIM,
+):
+    """
+    Start the fake server on a background thread.
+
+    Returns:
+        (server, base_url) - call ``server.shutdown()`` when done
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.config = {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "completion_chars": completion_chars,
+        "embedding_dim": embedding_dim,
+    }
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--completion-chars", type=int, default=800)
+    parser.add_argument("--embedding-dim", type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_openai(
+        args.host,
+        args.port,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.completion_chars,
+        args.embedding_dim,
+    )
+    print(f"Fake OpenAI API listening on {base_url} (OPENAI_BASE_URL={base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
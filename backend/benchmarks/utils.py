@@ -0,0 +1,127 @@
+"""Shared helpers for the benchmark scripts."""
+
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+
+def setup_django(openai_base_url=None):
+    """
+    Configure Django against a throwaway test database.
+
+    Must run before the OpenAI client is first used so that it picks up
+    ``OPENAI_BASE_URL``.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "boardboost_project.settings")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+    os.environ.setdefault("TRACING_ENABLED", "False")
+    # Benchmarks drive one user hard; measure capacity, not per-user limits
+    for name in ("SEND_MESSAGE_RATE", "COMPILE_RATE"):
+        os.environ.setdefault(name, "")
+    for name in ("SEND_MESSAGE_MAX_IN_FLIGHT", "COMPILE_MAX_IN_FLIGHT"):
+        os.environ.setdefault(name, "0")
+    # Test database ids would collide with the real embedding files
+    os.environ.setdefault(
+        "EMBEDDING_INDEX_DIR", tempfile.mkdtemp(prefix="embedding-index-")
+    )
+    if openai_base_url:
+        os.environ["OPENAI_BASE_URL"] = openai_base_url
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    return connection
+
+
+def teardown_django(connection):
+    connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def latency_stats(seconds):
+    """Summarize a list of durations (seconds) in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    ms = [s * 1000 for s in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def write_report(report, output=None):
+    """Write a benchmark report as JSON to a file or stdout."""
+    report.setdefault(
+        "environment",
+        {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def live_login(url, username, password):
+    """
+    Log in to a running server through the login form.
+
+    Returns:
+        (opener, csrf_token) - an urllib opener carrying the session cookie
+    """
+
+    def cookie(name):
+        for c in jar:
+            if c.name == name:
+                return c.value
+        return None
+
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    opener.open(f"{url}/login/").read()
+    form = urllib.parse.urlencode(
+        {
+            "username": username,
+            "password": password,
+            "csrfmiddlewaretoken": cookie("csrftoken"),
+        }
+    ).encode()
+    opener.open(
+        urllib.request.Request(
+            f"{url}/login/", data=form, headers={"Referer": f"{url}/login/"}
+        )
+    ).read()
+    if not cookie("sessionid"):
+        raise RuntimeError(f"Login as {username!r} failed")
+    return opener, cookie("csrftoken")
@@ -45,8 +45,102 @@ except Exception:
 # API Keys
 OPENAI_API_KEY = env("OPENAI_API_KEY")
 
+# Shared cache, e.g. locmemcache:// (per process), filecache:///var/tmp/cache
+# or redis://host:6379/0. Rate limits, duplicate-request detection and
+# cached sessions only work across workers with a file or Redis cache.
+CACHES = {"default": env.cache_url("CACHE_URL", default="locmemcache://")}
+CACHES["default"]["KEY_PREFIX"] = env("CACHE_KEY_PREFIX", default="boardboost")
+
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Cached model choices of users and projects (seconds)
+MODEL_SETTINGS_CACHE_TTL = env.int("MODEL_SETTINGS_CACHE_TTL", default=300)
+
+# Rolling conversation summaries
+SUMMARY_INPUT_TOKEN_BUDGET = env.int("SUMMARY_INPUT_TOKEN_BUDGET", default=6000)
+SUMMARY_MESSAGE_CHUNK_SIZE = env.int("SUMMARY_MESSAGE_CHUNK_SIZE", default=200)
+SUMMARY_KEEP_COUNT = env.int("SUMMARY_KEEP_COUNT", default=2)
+
+# Cross-project retrieval (per-user approximate nearest neighbour index)
+EMBEDDING_INDEX_ENABLED = env.bool("EMBEDDING_INDEX_ENABLED", default=True)
+EMBEDDING_INDEX_DIR = env("EMBEDDING_INDEX_DIR", default=BASE_DIR / "embedding_index")
+EMBEDDING_INDEX_MIN_TRAIN_ROWS = env.int("EMBEDDING_INDEX_MIN_TRAIN_ROWS", default=1024)
+EMBEDDING_INDEX_NPROBE = env.int("EMBEDDING_INDEX_NPROBE", default=8)
+# Memory maps of index files kept open per worker process (one file descriptor each)
+EMBEDDING_INDEX_MAX_OPEN_MAPS = env.int("EMBEDDING_INDEX_MAX_OPEN_MAPS", default=256)
+CROSS_PROJECT_CONTEXT_COUNT = env.int("CROSS_PROJECT_CONTEXT_COUNT", default=2)
+CROSS_PROJECT_MIN_SIMILARITY = env.float("CROSS_PROJECT_MIN_SIMILARITY", default=0.85)
+
+# Per-user rate limits ("requests/period", empty disables) and the number
+# of requests a user may have in flight at once (0 disables)
+THROTTLE_RATES = {
+    "send_message": env("SEND_MESSAGE_RATE", default="30/min"),
+    "compile": env("COMPILE_RATE", default="12/min"),
+}
+CONCURRENCY_LIMITS = {
+    "send_message": env.int("SEND_MESSAGE_MAX_IN_FLIGHT", default=2),
+    "compile": env.int("COMPILE_MAX_IN_FLIGHT", default=1),
+}
+CONCURRENCY_RETRY_AFTER = env.int("CONCURRENCY_RETRY_AFTER", default=5)
+CONCURRENCY_SLOT_TIMEOUT = env.int("CONCURRENCY_SLOT_TIMEOUT", default=300)
+
+# Duplicate send_message requests (seconds). Results are replayed for
+# requests with the same Idempotency-Key for SEND_MESSAGE_IDEMPOTENCY_TTL,
+# and for identical content without a key for SEND_MESSAGE_DEDUP_WINDOW.
+SEND_MESSAGE_IDEMPOTENCY_TTL = env.int("SEND_MESSAGE_IDEMPOTENCY_TTL", default=600)
+SEND_MESSAGE_DEDUP_WINDOW = env.int("SEND_MESSAGE_DEDUP_WINDOW", default=5)
+SEND_MESSAGE_LOCK_TIMEOUT = env.int("SEND_MESSAGE_LOCK_TIMEOUT", default=120)
+
+# Cached project list per user (seconds)
+PROJECT_LIST_CACHE_TTL = env.int("PROJECT_LIST_CACHE_TTL", default=300)
+
+# Newest messages included per conversation by the conversations API
+CONVERSATION_MESSAGE_LIMIT = env.int("CONVERSATION_MESSAGE_LIMIT", default=50)
+
+# Retention (see the apply_retention command). Messages older than
+# RETENTION_MESSAGE_DAYS that are already covered by a summary are pruned;
+# 0 keeps them forever. Pruned messages are archived to
+# RETENTION_ARCHIVE_DIR when set.
+RETENTION_MESSAGE_DAYS = env.int("RETENTION_MESSAGE_DAYS", default=0)
+RETENTION_ARCHIVE_DIR = env("RETENTION_ARCHIVE_DIR", default="")
+RETENTION_BATCH_SIZE = env.int("RETENTION_BATCH_SIZE", default=1000)
+
+# Project export/import (records per database round trip)
+PROJECT_TRANSFER_BATCH_SIZE = env.int("PROJECT_TRANSFER_BATCH_SIZE", default=500)
+
+# Model routing. Short prompts without code go to MODEL_ROUTER_FAST_MODEL
+# when it is cheaper than the selected model (empty disables). Requests
+# failing with a timeout, rate limit or 5xx are retried on
+# MODEL_ROUTER_FALLBACK_MODEL (the same model when empty). A request still
+# running after MODEL_ROUTER_HEDGE_AFTER seconds is hedged with a second
+# one (0 disables).
+MODEL_ROUTER_FAST_MODEL = env("MODEL_ROUTER_FAST_MODEL", default="")
+MODEL_ROUTER_FAST_MAX_CHARS = env.int("MODEL_ROUTER_FAST_MAX_CHARS", default=200)
+MODEL_ROUTER_FALLBACK_MODEL = env("MODEL_ROUTER_FALLBACK_MODEL", default="gpt-4o-mini")
+MODEL_ROUTER_TIMEOUT = env.float("MODEL_ROUTER_TIMEOUT", default=60.0)
+MODEL_ROUTER_MAX_RETRIES = env.int("MODEL_ROUTER_MAX_RETRIES", default=0)
+MODEL_ROUTER_HEDGE_AFTER = env.float("MODEL_ROUTER_HEDGE_AFTER", default=0)
+
+# Semantic response cache for generic questions (opt-in)
+RESPONSE_CACHE_ENABLED = env.bool("RESPONSE_CACHE_ENABLED", default=False)
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = env.float(
+    "RESPONSE_CACHE_SIMILARITY_THRESHOLD", default=0.95
+)
+RESPONSE_CACHE_TTL = env.int("RESPONSE_CACHE_TTL", default=7 * 24 * 60 * 60)
+RESPONSE_CACHE_MAX_CANDIDATES = env.int("RESPONSE_CACHE_MAX_CANDIDATES", default=500)
+
+# Warm arduino-cli up when a worker starts and report it in /readyz/
+# (disable where arduino-cli isn't installed)
+ARDUINO_CLI_WARM_UP = env.bool("ARDUINO_CLI_WARM_UP", default=True)
+
+# Request tracing (Server-Timing headers, JSON logs and /metrics/)
+TRACING_ENABLED = env.bool("TRACING_ENABLED", default=True)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
 # Beta Limit
 MAX_BETA_USERS = env("MAX_BETA_USERS", default=2)
+SITE_SETTINGS_CACHE_TTL = env.int("SITE_SETTINGS_CACHE_TTL", default=60)
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env("DEBUG")
@@ -115,6 +209,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "chat.middleware.ServerTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -159,17 +254,54 @@ WSGI_APPLICATION = "boardboost_project.wsgi.application"
 
 
 # Database configuration
+# Database connections. CONN_MAX_AGE keeps a connection open between
+# requests for that many seconds (0 closes it after every request) and
+# CONN_HEALTH_CHECKS checks a reused connection before the first query.
+# DATABASE_POOL switches PostgreSQL to psycopg's connection pool instead;
+# Django requires CONN_MAX_AGE=0 then, so it is ignored.
+CONN_MAX_AGE = env.int("CONN_MAX_AGE", default=60)
+CONN_HEALTH_CHECKS = env.bool("CONN_HEALTH_CHECKS", default=True)
+DATABASE_POOL = env.bool("DATABASE_POOL", default=False)
+DATABASE_POOL_MIN_SIZE = env.int("DATABASE_POOL_MIN_SIZE", default=2)
+DATABASE_POOL_MAX_SIZE = env.int("DATABASE_POOL_MAX_SIZE", default=4)
+DATABASE_POOL_TIMEOUT = env.float("DATABASE_POOL_TIMEOUT", default=10.0)
+
 if env("DATABASE_URL", default=None):
     # If DATABASE_URL is provided, use it (Digital Ocean PostgreSQL)
     DATABASES = {
         "default": env.db(),
     }
+    if DATABASE_POOL:
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DATABASE_POOL_MIN_SIZE,
+            "max_size": DATABASE_POOL_MAX_SIZE,
+            "timeout": DATABASE_POOL_TIMEOUT,
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = CONN_HEALTH_CHECKS
 else:
-    # Fallback to SQLite if no DATABASE_URL is provided
+    # Fallback to SQLite if no DATABASE_URL is provided. WAL lets readers
+    # run alongside a writer, and IMMEDIATE transactions take the write
+    # lock up front so concurrent writers wait on busy_timeout instead of
+    # failing with "database is locked".
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "CONN_MAX_AGE": CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": CONN_HEALTH_CHECKS,
+            "OPTIONS": {
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA busy_timeout=5000;"
+                    "PRAGMA temp_store=MEMORY;"
+                    "PRAGMA mmap_size=134217728;"
+                ),
+                "transaction_mode": "IMMEDIATE",
+            },
         }
     }
 
@@ -213,9 +345,29 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 # STATICFILES_DIRS = [
 #     os.path.join(BASE_DIR, "chat", "static"),
 # ]
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# Static files are collected, minified, hashed and compressed (gzip and
+# Brotli) when the image is built
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "chat.storage.MinifiedStaticFilesStorage"},
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Logging
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "chat": {
+            "handlers": ["console"],
+            "level": env("CHAT_LOG_LEVEL", default="INFO"),
+        },
+    },
+}
@@ -1,10 +1,19 @@
 from django.contrib import admin
-from .models import Project, Conversation, Message, SiteSettings
+from .models import Project, Conversation, Message, SiteSettings, CachedResponse
 
 admin.site.register(Project)
 admin.site.register(Conversation)
 admin.site.register(Message)
 
+
+class CachedResponseAdmin(admin.ModelAdmin):
+    list_display = ("question", "model", "board_type", "hit_count", "created_at")
+    list_filter = ("model", "board_type")
+    exclude = ("embedding",)
+
+
+admin.site.register(CachedResponse, CachedResponseAdmin)
+
 # In chat/admin.py
 from .models import SiteSettings
 
@@ -1,27 +1,45 @@
-from openai import OpenAI
 from django.conf import settings
 from django.utils import timezone
-import numpy as np
-from .models import Message, Conversation, ConversationSummary, MessageEmbedding
-
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-from openai import OpenAI
-from django.conf import settings
-from django.utils import timezone
-import numpy as np
 from .models import (
     Message,
     Conversation,
     ConversationSummary,
     MessageEmbedding,
-    UserProfile,
-    Project,
 )
+from .model_preferences import resolve_model_settings
+from .model_router import (
+    ROUTE_CACHE,
+    ROUTE_ERROR,
+    Route,
+    choose_model,
+    complete_chat,
+    record_route,
+)
+from .rendering import render_markdown
+from .response_cache import (
+    is_cacheable,
+    lookup_cached_response,
+    store_cached_response,
+)
+from .tracing import span, traced
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Built on first use by get_client(); the openai package takes long enough
+# to import that worker boot and management commands shouldn't pay for it.
+# Assigning a client here (e.g. one pointed at a fake server) replaces it.
+client = None
 
 
+def get_client():
+    """Return the shared OpenAI client, creating it on first use"""
+    global client
+    if client is None:
+        from openai import OpenAI
+
+        client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    return client
+
+
+@traced("model_settings")
 def get_model_for_user(user, project_id=None, is_summary=False):
     """
     Determine which model to use based on user preferences and project settings.
@@ -34,40 +52,13 @@ def get_model_for_user(user, project_id=None, is_summary=False):
     Returns:
         String representing the model name to use
     """
-    # Default fallback model
-    default_model = "gpt-3.5-turbo"
-
-    try:
-        # Get user's default preferences
-        profile = UserProfile.objects.get(user=user)
-        user_default = (
-            profile.default_summary_model if is_summary else profile.default_query_model
-        )
-
-        # If no project specified, use user default
-        if not project_id:
-            return user_default or default_model
-
-        # Check for project-specific preference
-        try:
-            project = Project.objects.get(id=project_id)
-            project_model = project.summary_model if is_summary else project.query_model
-
-            # If project has a specific model set, use it
-            if project_model:
-                return project_model
-
-            # Otherwise use user default
-            return user_default or default_model
-
-        except Project.DoesNotExist:
-            return user_default or default_model
+    return resolve_model_settings(user, project_id).model_for(is_summary)
 
-    except UserProfile.DoesNotExist:
-        return default_model
 
-
-def generate_conversation_summary(conversation_id, user, message_threshold=10):
+@traced("summary")
+def generate_conversation_summary(
+    conversation_id, user, message_threshold=10, model_settings=None
+):
     """
     Generate or update a summary for a conversation if it has enough new messages.
 
@@ -75,6 +66,7 @@ def generate_conversation_summary(conversation_id, user, message_threshold=10):
         conversation_id: ID of the conversation
         user: User requesting the summary
         message_threshold: Minimum number of new messages before generating a summary
+        model_settings: Optional ModelSettings already resolved for this request
 
     Returns:
         ConversationSummary or None
@@ -83,55 +75,76 @@ def generate_conversation_summary(conversation_id, user, message_threshold=10):
     project_id = conversation.project_id
 
     # Get the appropriate model based on user and project settings
-    model = get_model_for_user(user, project_id, is_summary=True)
+    if model_settings is None:
+        model_settings = resolve_model_settings(user, project_id)
+    model = model_settings.model_for(is_summary=True)
 
     # Get the latest summary
     latest_summary = (
         ConversationSummary.objects.filter(conversation=conversation)
-        .order_by("-created_at")
+        .order_by("-created_at", "-id")
         .first()
     )
 
-    # Count total messages
-    total_messages = Message.objects.filter(conversation=conversation).count()
-
-    # If we have a summary, check if we have enough new messages
+    # Only messages the latest summary doesn't cover yet
+    new_messages = Message.objects.filter(conversation=conversation)
     if latest_summary:
-        messages_since_summary = total_messages - latest_summary.message_count
-        if messages_since_summary < message_threshold:
+        if latest_summary.last_message_id is not None:
+            new_messages = new_messages.filter(id__gt=latest_summary.last_message_id)
+        else:
+            # Summaries written before last_message_id was tracked
+            new_messages = new_messages.filter(timestamp__gt=latest_summary.created_at)
+
+        # Check if we have enough new messages
+        if new_messages.count() < message_threshold:
             return latest_summary
 
-    # Get all messages or messages since last summary
-    if latest_summary:
-        messages = Message.objects.filter(
-            conversation=conversation, timestamp__gt=latest_summary.created_at
-        ).order_by("timestamp")
-        conversation_text = (
-            f"Previous summary: {latest_summary.content}\n\nNew messages:\n"
-        )
+        header = f"Previous summary: {latest_summary.content}\n\nNew messages:"
+        previous_count = latest_summary.message_count
     else:
-        messages = Message.objects.filter(conversation=conversation).order_by(
-            "timestamp"
-        )
-        conversation_text = "Conversation:\n"
-
-    # Format the messages
-    for msg in messages:
-        conversation_text += f"{msg.sender}: {msg.content}\n"
+        header = "Conversation:"
+        previous_count = 0
+
+    # Stream the new messages oldest first until the input token budget is spent.
+    # Anything left over is picked up by the next summary.
+    lines = [header]
+    budget = settings.SUMMARY_INPUT_TOKEN_BUDGET - estimate_token_count(header)
+    last_message_id = None
+    for msg in (
+        new_messages.order_by("id")
+        .only("id", "sender", "content")
+        .iterator(chunk_size=settings.SUMMARY_MESSAGE_CHUNK_SIZE)
+    ):
+        line = f"{msg.sender}: {msg.content}"
+        cost = estimate_token_count(line)
+        if cost > budget:
+            if last_message_id is not None:
+                break
+            # A single oversized message is truncated rather than skipped
+            line = line[: max(budget, 1) * 4]
+        lines.append(line)
+        budget -= cost
+        last_message_id = msg.id
+
+    if last_message_id is None:
+        return latest_summary
+
+    conversation_text = "\n".join(lines) + "\n"
 
     # Generate a summary using OpenAI
     try:
         summary_prompt = "You are an Arduino coding assistant. Summarize this conversation about Arduino programming and related topics, focusing on technical details, questions asked, and solutions provided. Keep the summary concise but include all important technical information."
 
-        response = client.chat.completions.create(
-            model=model,  # Use the model determined by user/project settings
-            messages=[
-                {"role": "system", "content": summary_prompt},
-                {"role": "user", "content": conversation_text},
-            ],
-            temperature=0.5,  # TODO Expose this to end user
-            max_tokens=300,  # TODO Expose this to end user
-        )
+        with span("summary_completion"):
+            response = get_client().chat.completions.create(
+                model=model,  # Use the model determined by user/project settings
+                messages=[
+                    {"role": "system", "content": summary_prompt},
+                    {"role": "user", "content": conversation_text},
+                ],
+                temperature=0.5,  # TODO Expose this to end user
+                max_tokens=300,  # TODO Expose this to end user
+            )
 
         summary_text = response.choices[0].message.content
 
@@ -139,9 +152,13 @@ def generate_conversation_summary(conversation_id, user, message_threshold=10):
         summary = ConversationSummary.objects.create(
             conversation=conversation,
             content=summary_text,
-            message_count=total_messages,
+            message_count=previous_count + len(lines) - 1,
+            last_message_id=last_message_id,
         )
 
+        # Older summaries are folded into the new one
+        compact_conversation_summaries(conversation)
+
         return summary
 
     except Exception as e:
@@ -149,6 +166,34 @@ def generate_conversation_summary(conversation_id, user, message_threshold=10):
         return latest_summary if latest_summary else None
 
 
+@traced("summary_compaction")
+def compact_conversation_summaries(conversation, keep=None):
+    """
+    Delete all but the most recent summaries of a conversation.
+
+    Args:
+        conversation: The conversation object
+        keep: Number of summaries to keep (defaults to SUMMARY_KEEP_COUNT)
+
+    Returns:
+        Number of summaries deleted
+    """
+    if keep is None:
+        keep = settings.SUMMARY_KEEP_COUNT
+
+    stale_ids = list(
+        ConversationSummary.objects.filter(conversation=conversation)
+        .order_by("-created_at", "-id")
+        .values_list("id", flat=True)[keep:]
+    )
+    if not stale_ids:
+        return 0
+
+    deleted, _ = ConversationSummary.objects.filter(id__in=stale_ids).delete()
+    return deleted
+
+
+@traced("embedding")
 def get_message_embedding(message_content):
     """
     Get an embedding vector for a message.
@@ -160,7 +205,7 @@ def get_message_embedding(message_content):
         List of floats representing the embedding vector
     """
     try:
-        response = client.embeddings.create(
+        response = get_client().embeddings.create(
             input=message_content,
             model="text-embedding-ada-002",  # TODO Expose this to end user
         )
@@ -180,6 +225,8 @@ def compute_similarity(embedding1, embedding2):
     Returns:
         Float value representing similarity (higher is more similar)
     """
+    import numpy as np
+
     # Convert to numpy arrays
     vec1 = np.array(embedding1)
     vec2 = np.array(embedding2)
@@ -192,7 +239,10 @@ def compute_similarity(embedding1, embedding2):
     return dot_product / (norm1 * norm2)
 
 
-def find_relevant_messages(current_message, conversation_id, limit=3):
+@traced("similarity_search")
+def find_relevant_messages(
+    current_message, conversation_id, limit=3, exclude_ids=None, query_embedding=None
+):
     """
     Find messages in the conversation that are most relevant to the current message.
 
@@ -200,60 +250,123 @@ def find_relevant_messages(current_message, conversation_id, limit=3):
         current_message: Text of the current message
         conversation_id: ID of the conversation
         limit: Maximum number of relevant messages to return
+        exclude_ids: Optional collection of message IDs to leave out (e.g. messages
+            already included in the recent history window)
+        query_embedding: Optional embedding of the current message, if the
+            caller already computed it
 
     Returns:
         List of Message objects
     """
     # Get embedding for current message
-    current_embedding = get_message_embedding(current_message)
+    current_embedding = query_embedding or get_message_embedding(current_message)
     if not current_embedding:
         return []
 
-    # Get previous messages with embeddings
-    previous_messages = Message.objects.filter(
-        conversation_id=conversation_id,
-        sender="assistant",  # Focus on assistant responses as they contain more information
-    ).order_by("-timestamp")
-
-    # Compute similarities
-    similarities = []
-    for msg in previous_messages:
-        # Get or create embedding
-        try:
-            embedding_obj = MessageEmbedding.objects.get(message=msg)
-            embedding = embedding_obj.embedding
-        except MessageEmbedding.DoesNotExist:
-            embedding = get_message_embedding(msg.content)
-            if embedding:
-                MessageEmbedding.objects.create(message=msg, embedding=embedding)
-            else:
-                continue
-
-        # Compute similarity
-        similarity = compute_similarity(current_embedding, embedding)
-        similarities.append((msg, similarity))
-
-    # Sort by similarity and return top results
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    return [msg for msg, _ in similarities[:limit]]
+    # numpy-backed; imported here to keep it out of worker boot
+    from .embedding_index import ConversationEmbeddingStore
+
+    # Bring the conversation's embedding matrix up to date; only assistant
+    # messages newer than the last sync are read from the database
+    store = ConversationEmbeddingStore(conversation_id)
+    store.sync(get_message_embedding)
+
+    # Over-fetch a little in case matched messages were deleted since
+    hits = store.search(current_embedding, limit=limit * 2, exclude_ids=exclude_ids)
+    if not hits:
+        return []
+
+    # Scoped to the conversation in case the store files are stale (e.g. a
+    # reused conversation ID)
+    messages = Message.objects.filter(conversation_id=conversation_id).in_bulk(
+        [message_id for message_id, _ in hits]
+    )
+    relevant = [
+        messages[message_id] for message_id, _ in hits if message_id in messages
+    ]
+    return relevant[:limit]
+
+
+@traced("cross_project_search")
+def find_cross_project_messages(user, query_embedding, exclude_project_id, limit=2):
+    """
+    Find assistant messages from the user's other projects that are relevant
+    to the current message, using the user's embedding index.
+
+    Args:
+        user: The user whose projects are searched
+        query_embedding: Embedding of the current message
+        exclude_project_id: The current project (already covered by other context)
+        limit: Maximum number of messages to return
+
+    Returns:
+        List of Message objects, most similar first
+    """
+    from .embedding_index import UserEmbeddingIndex
+
+    # The index files are local to this instance; build them on first use
+    index = UserEmbeddingIndex(user.id)
+    index.ensure_built()
+
+    hits = [
+        (message_id, similarity)
+        for message_id, _, similarity in index.search(
+            query_embedding, limit=limit, exclude_project_id=exclude_project_id
+        )
+        if similarity >= settings.CROSS_PROJECT_MIN_SIMILARITY
+    ]
+    if not hits:
+        return []
+
+    # Only ever the user's own messages, even if the index is stale
+    messages = (
+        Message.objects.filter(conversation__project__user=user)
+        .select_related("conversation__project")
+        .in_bulk([message_id for message_id, _ in hits])
+    )
+    # Messages deleted since they were indexed are skipped
+    return [messages[message_id] for message_id, _ in hits if message_id in messages]
 
 
+@traced("context")
 def build_context_for_message(
-    current_message, conversation_id, user=None, recent_message_count=5
+    current_message,
+    conversation_id,
+    user=None,
+    recent_message_count=None,
+    relevant_message_count=3,
+    model_settings=None,
+    query_embedding=None,
+    shared=False,
 ):
     """
     Build context for the current message using our hybrid approach.
 
+    The recent history window defaults to the project's ``history_window_size``.
+    Messages already inside that window are excluded from the semantic search so
+    they are never sent to the model twice, and the search is skipped entirely
+    when the window already covers the whole conversation.
+
     Args:
         current_message: Text of the current message
         conversation_id: ID of the conversation
-        recent_message_count: Number of recent messages to include
+        recent_message_count: Number of recent messages to include (defaults to
+            the project's history window size)
+        relevant_message_count: Maximum number of semantically relevant messages
+            to include from outside the recent window
+        model_settings: Optional ModelSettings already resolved for this request
+        query_embedding: Optional embedding of the current message
+        shared: True when the answer may be served to other users from the
+            response cache; the project name and snippets from the user's other
+            projects are left out
 
     Returns:
         List of OpenAI message objects representing the context
     """
     try:
-        conversation = Conversation.objects.get(id=conversation_id)
+        conversation = Conversation.objects.select_related("project").get(
+            id=conversation_id
+        )
 
         # If user is not provided, try to get it from the project
         if (
@@ -267,27 +380,68 @@ def build_context_for_message(
         summary = None
         if user is not None:
             try:
-                summary = generate_conversation_summary(conversation_id, user)
+                summary = generate_conversation_summary(
+                    conversation_id, user, model_settings=model_settings
+                )
             except Exception as e:
                 print(f"Error generating summary: {e}")
                 # Continue without a summary if there's an error
 
-        # Get conversation summary
-        summary = generate_conversation_summary(conversation_id, user) if user else None
+        # Use the project's history window unless the caller overrides it
+        if recent_message_count is None:
+            recent_message_count = conversation.project.history_window_size
+
         # Get recent messages
-        recent_messages = Message.objects.filter(conversation=conversation).order_by(
-            "-timestamp"
-        )[:recent_message_count]
+        with span("recent_history"):
+            recent_messages = list(
+                Message.objects.filter(conversation=conversation).order_by(
+                    "-timestamp"
+                )[:recent_message_count]
+            )
 
-        # Get semantically relevant messages
-        relevant_messages = find_relevant_messages(current_message, conversation_id)
+        # Get semantically relevant messages that are not already in the window.
+        # A window that isn't full already holds the entire conversation.
+        search_conversation = (
+            len(recent_messages) >= recent_message_count and relevant_message_count
+        )
+        search_other_projects = (
+            user is not None
+            and not shared
+            and settings.EMBEDDING_INDEX_ENABLED
+            and settings.CROSS_PROJECT_CONTEXT_COUNT
+        )
+        if (search_conversation or search_other_projects) and not query_embedding:
+            query_embedding = get_message_embedding(current_message)
+
+        relevant_messages = []
+        if search_conversation:
+            relevant_messages = find_relevant_messages(
+                current_message,
+                conversation_id,
+                limit=relevant_message_count,
+                exclude_ids={msg.id for msg in recent_messages},
+                query_embedding=query_embedding,
+            )
+
+        # Get relevant snippets from the user's other projects
+        cross_project_messages = []
+        if search_other_projects and query_embedding:
+            try:
+                cross_project_messages = find_cross_project_messages(
+                    user,
+                    query_embedding,
+                    exclude_project_id=conversation.project_id,
+                    limit=settings.CROSS_PROJECT_CONTEXT_COUNT,
+                )
+            except Exception as e:
+                print(f"Error searching other projects: {e}")
 
         # Build context
         context_messages = []
 
         # Add project information
         project = conversation.project
-        project_context = f"Project Name: {project.name}\n"
+        project_context = "" if shared else f"Project Name: {project.name}\n"
 
         if project.board_type:
             project_context += f"Arduino Board: {project.board_type}\n"
@@ -301,12 +455,12 @@ def build_context_for_message(
         if project.description:
             project_context += f"Project Description: {project.description}\n"
 
-        context_messages.append(
-            {
-                "role": "system",
-                "content": f"You are an Arduino coding assistant. The user is working on the following project:\n{project_context}",
-            }
-        )
+        system_prompt = "You are an Arduino coding assistant."
+        if project_context:
+            system_prompt += (
+                f" The user is working on the following project:\n{project_context}"
+            )
+        context_messages.append({"role": "system", "content": system_prompt})
 
         # Add conversation summary if available
         if summary:
@@ -326,6 +480,19 @@ def build_context_for_message(
 
             context_messages.append({"role": "system", "content": relevant_context})
 
+        # Add snippets from the user's other projects
+        if cross_project_messages:
+            cross_project_context = "Relevant answers from the user's other projects:\n"
+            for msg in cross_project_messages:
+                project_name = msg.conversation.project.name
+                cross_project_context += (
+                    f"[{project_name}] assistant: {msg.content}\n\n"
+                )
+
+            context_messages.append(
+                {"role": "system", "content": cross_project_context}
+            )
+
         # Add recent messages
         for msg in reversed(list(recent_messages)):  # Oldest to newest
             if msg.content != current_message:  # Avoid duplicating current message
@@ -344,50 +511,101 @@ def build_context_for_message(
 
 
 ## Generate response with enhanced context management
+@traced("generate_response")
 def generate_response(current_message, conversation_id, user):
     """
     Generate a response using OpenAI's API with enhanced context management.
 
+    When the response cache is enabled and the conversation carries no
+    project-specific context, a stored answer to a near-identical question
+    is returned without calling the model.
+
+    The model is chosen and slow or failed requests are retried by the
+    model router; the returned Route records how the response was produced.
+
     Returns:
-        tuple: (response_text, tokens_used)
+        tuple: (response_text, tokens_used, route)
     """
+    model = ""
     try:
         # Get the conversation to determine the project
-        conversation = Conversation.objects.get(id=conversation_id)
+        conversation = Conversation.objects.select_related("project").get(
+            id=conversation_id
+        )
         project_id = conversation.project_id
-
-        # Determine which model to use
-        model = get_model_for_user(user, project_id, is_summary=False)
+        board_type = conversation.project.board_type
+
+        # Resolve the user's model choices once for the whole request
+        with span("model_settings"):
+            model_settings = resolve_model_settings(user, project_id)
+        model = model_settings.model_for(is_summary=False)
+
+        # Check the shared response cache for generic questions. Answers are
+        # stored under the model that produced them, so look up the model the
+        # router would pick for this question.
+        query_embedding = None
+        cacheable = is_cacheable(conversation)
+        if cacheable:
+            query_embedding = get_message_embedding(current_message)
+            if query_embedding:
+                with span("cache_lookup"):
+                    cached = lookup_cached_response(
+                        query_embedding,
+                        choose_model(model, current_message).model,
+                        board_type,
+                    )
+                if cached:
+                    route = Route(ROUTE_CACHE, cached.model)
+                    record_route(route)
+                    return cached.response, 0, route
 
         # Build context using our advanced context manager - pass the user
         context_messages = build_context_for_message(
             current_message=current_message,
             conversation_id=conversation_id,
             user=user,
-            recent_message_count=5,
+            model_settings=model_settings,
+            query_embedding=query_embedding,
+            shared=cacheable,
         )
 
         # Add the current user message
         messages = context_messages + [{"role": "user", "content": current_message}]
 
-        # Call OpenAI API with the determined model
-        completion = client.chat.completions.create(
-            model=model, messages=messages, temperature=0.7, max_tokens=1000
-        )
+        # Call OpenAI API; the router may pick a cheaper model, hedge a slow
+        # request or fall back to another model
+        with span("completion"):
+            completion, route = complete_chat(
+                get_client(),
+                model,
+                messages,
+                current_message,
+                temperature=0.7,
+                max_tokens=1000,
+            )
 
         # Extract token usage
         prompt_tokens = completion.usage.prompt_tokens
         completion_tokens = completion.usage.completion_tokens
         total_tokens = prompt_tokens + completion_tokens
+        response_text = completion.choices[0].message.content
 
-        return completion.choices[0].message.content, total_tokens
+        if cacheable and query_embedding:
+            store_cached_response(
+                current_message, query_embedding, route.model, board_type, response_text
+            )
+
+        return response_text, total_tokens, route
 
     except Exception as e:
         # In case of any errors, return a fallback message
         print(f"Error calling OpenAI API: {e}")
+        route = Route(ROUTE_ERROR, model)
+        record_route(route)
         return (
             f"I'm sorry, I encountered an error generating a response. Please try again later.",
             0,
+            route,
         )
 
 
@@ -399,7 +617,8 @@ def estimate_token_count(text):
     return len(text) // 4 + 1
 
 
-def save_conversation_message(conversation, sender, content):
+@traced("db_write")
+def save_conversation_message(conversation, sender, content, route=None):
     """
     Utility function to save a message to a conversation.
 
@@ -407,14 +626,33 @@ def save_conversation_message(conversation, sender, content):
         conversation: The conversation object
         sender: 'user' or 'assistant'
         content: The message content
+        route: Optional Route that produced an assistant message
 
     Returns:
         The saved Message object
     """
 
-    # Save the message
+    # Save the message, rendering assistant markdown once up front
+    content_html = render_markdown(content) if sender == "assistant" else ""
     message = Message.objects.create(
-        conversation=conversation, sender=sender, content=content
+        conversation=conversation,
+        sender=sender,
+        content=content,
+        content_html=content_html,
+        model=route.model if route else "",
+        route=route.route if route else "",
     )
 
+    # Embed assistant replies right away so new projects show up in the
+    # cross-project index (the save signal indexes the embedding); failures
+    # are retried when the conversation's embedding store next syncs
+    if (
+        sender == "assistant"
+        and settings.EMBEDDING_INDEX_ENABLED
+        and not (route and route.route == ROUTE_ERROR)
+    ):
+        embedding = get_message_embedding(content)
+        if embedding:
+            MessageEmbedding.objects.create(message=message, embedding=embedding)
+
     return message
@@ -3,6 +3,7 @@ import os
 import json
 import tempfile
 import base64
+import threading
 from django.conf import settings
 import logging
 
@@ -10,6 +11,35 @@ logger = logging.getLogger(__name__)
 
 
 class ArduinoCliService:
+    # Warm-up state for this worker process: "cold", "warming", "ok" or "error"
+    warm_up_state = "cold"
+    _warm_up_lock = threading.Lock()
+
+    @classmethod
+    def start_warm_up(cls):
+        """
+        Warm arduino-cli up in a background thread, once per process.
+
+        Listing the boards loads arduino-cli, its configuration and the
+        installed cores' metadata from disk, so the first compile doesn't
+        pay for it. Progress is reported by warm_up_state; a failed
+        warm-up is retried on the next call.
+        """
+        with cls._warm_up_lock:
+            if cls.warm_up_state in ("warming", "ok"):
+                return
+            cls.warm_up_state = "warming"
+        threading.Thread(target=cls._warm_up, daemon=True).start()
+
+    @classmethod
+    def _warm_up(cls):
+        try:
+            cls.get_installed_boards()
+            cls.warm_up_state = "ok"
+        except Exception as e:
+            logger.error(f"arduino-cli warm-up failed: {e}")
+            cls.warm_up_state = "error"
+
     @staticmethod
     def get_installed_boards():
         """Get list of installed board platforms"""
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+
+# Version per key namespace. Bump a namespace's version when the shape of
+# the values stored under it changes, so that workers running the new code
+# never read entries written by the old code (and vice versa during a
+# rolling deploy).
+KEY_VERSIONS = {
+    "project_list": 1,
+    "site_settings": 1,
+    "send_message": 1,
+    "throttle": 1,
+    "in_flight": 1,
+    "model_settings": 1,
+}
+
+# Distinguishes "not cached" from a cached None
+_MISSING = object()
+
+
+def make_key(namespace, *parts):
+    """
+    Build a cache key such as ``chat:project_list:v1:42``.
+
+    Args:
+        namespace: Key namespace; must be listed in KEY_VERSIONS
+        *parts: Values identifying the entry within the namespace
+
+    Returns:
+        The cache key
+    """
+    version = KEY_VERSIONS[namespace]
+    return ":".join(["chat", namespace, f"v{version}", *map(str, parts)])
+
+
+def get_or_set(key, compute, timeout):
+    """
+    Return the cached value for ``key``, computing and storing it on a miss.
+
+    Unlike ``cache.get_or_set`` this also caches a computed None.
+
+    Args:
+        key: Cache key (see make_key)
+        compute: Callable returning the value to cache
+        timeout: Seconds to keep the value
+
+    Returns:
+        The cached or computed value
+    """
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
@@ -0,0 +1,481 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_store import AppendOnlyArray, directory_lock
+from .models import Message, MessageEmbedding
+
+logger = logging.getLogger(__name__)
+
+UNASSIGNED = -1
+
+# Upper bound on the rows k-means is fitted on
+TRAIN_SAMPLE_ROWS = 4096
+
+# Embeddings read per database round trip when an index is built
+BUILD_CHUNK_ROWS = 500
+
+# Users whose index this process is training
+_training = set()
+_training_lock = threading.Lock()
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(k):
+            members = vectors[assignments == i]
+            if len(members):
+                centroids[i] = members.sum(axis=0)
+            else:
+                # Re-seed empty clusters
+                centroids[i] = vectors[rng.integers(len(vectors))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class _EmbeddingFiles:
+    """A directory of append-only arrays described by a ``meta.json`` file."""
+
+    def __init__(self, *parts):
+        self.directory = os.path.join(str(settings.EMBEDDING_INDEX_DIR), *parts)
+        self.meta_path = os.path.join(self.directory, "meta.json")
+
+    def _meta(self):
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _array(self, name, width, dtype):
+        return AppendOnlyArray(os.path.join(self.directory, name), width, dtype)
+
+    def _remove_files(self):
+        for name in os.listdir(self.directory):
+            if name != ".lock":
+                os.remove(os.path.join(self.directory, name))
+
+    def clear(self):
+        """Remove the index files."""
+        with directory_lock(self.directory):
+            self._remove_files()
+
+
+class UserEmbeddingIndex(_EmbeddingFiles):
+    """
+    An IVF (inverted file) index over one user's assistant message embeddings
+    across all of their projects.
+
+    Vectors are stored normalized in append-only files that workers read via
+    ``np.memmap``. The files live on the instance's local disk, so an index
+    that doesn't exist yet (a new deploy, another instance) is built from the
+    MessageEmbedding rows on first use. Once enough rows exist the index is
+    clustered with k-means in a background thread; a search then only scores
+    rows in the ``nprobe`` clusters nearest to the query (plus rows added
+    since the last training).
+    """
+
+    def __init__(self, user_id):
+        super().__init__("users", str(user_id))
+        self.user_id = user_id
+
+    def _arrays(self, dim):
+        def array(name, width, dtype):
+            return self._array(name, width, dtype)
+
+        return {
+            "vectors": array("vectors.f32", dim, np.float32),
+            "message_ids": array("message_ids.i64", 1, np.int64),
+            "project_ids": array("project_ids.i64", 1, np.int64),
+            "lists": array("lists.i32", 1, np.int32),
+            "centroids": array("centroids.f32", dim, np.float32),
+        }
+
+    def __len__(self):
+        meta = self._meta()
+        if meta is None or meta["dim"] is None:
+            return 0
+        return len(self._arrays(meta["dim"])["message_ids"])
+
+    def _build(self):
+        """Fill the index from the database; callers hold the directory lock."""
+        self._remove_files()
+        meta = {"dim": None, "trained_rows": 0}
+        embeddings = (
+            MessageEmbedding.objects.filter(
+                message__conversation__project__user_id=self.user_id,
+                message__sender="assistant",
+            )
+            .order_by("id")
+            .values_list("message_id", "message__conversation__project_id", "embedding")
+        )
+        rows = []
+        for row in embeddings.iterator(chunk_size=BUILD_CHUNK_ROWS):
+            rows.append(row)
+            if len(rows) >= BUILD_CHUNK_ROWS:
+                self._append(meta, *zip(*rows))
+                rows = []
+        if rows:
+            self._append(meta, *zip(*rows))
+        # Written last: until then other workers see no index and wait for
+        # the lock to build it themselves
+        self._write_meta(meta)
+
+    def _append(self, meta, message_ids, project_ids, embeddings):
+        """Append rows to the files; callers hold the directory lock."""
+        try:
+            vectors = _normalize(embeddings).reshape(len(message_ids), -1)
+        except ValueError:
+            logger.warning(f"Skipped embeddings of mixed size for user {self.user_id}")
+            return False
+        dim = vectors.shape[1]
+        if meta["dim"] is None:
+            meta["dim"] = dim
+        elif meta["dim"] != dim:
+            logger.warning(
+                f"Embedding dimension changed for user {self.user_id} index "
+                f"({meta['dim']} -> {dim}); rebuild it with rebuild_embedding_index"
+            )
+            return False
+
+        arrays = self._arrays(dim)
+        centroids = arrays["centroids"].read()
+        if len(centroids):
+            lists = np.argmax(vectors @ centroids.T, axis=1)
+        else:
+            lists = np.full(len(vectors), UNASSIGNED)
+
+        # Message ids go last: readers use their count as the row count
+        arrays["vectors"].append(vectors)
+        arrays["project_ids"].append(project_ids)
+        arrays["lists"].append(lists)
+        arrays["message_ids"].append(message_ids)
+        return True
+
+    def ensure_built(self):
+        """Build the index from the database unless this instance has it."""
+        if self._meta() is not None:
+            return
+        with directory_lock(self.directory):
+            # Another worker may have built it while we waited for the lock
+            if self._meta() is None:
+                self._build()
+        self.train_in_background()
+
+    def rebuild(self):
+        """Rebuild the index from the database."""
+        with directory_lock(self.directory):
+            self._build()
+
+    def add(self, message_ids, project_ids, embeddings):
+        """
+        Append embeddings for saved assistant messages to the index.
+
+        If the index doesn't exist yet it is built from the database instead,
+        which covers these messages too.
+        """
+        with directory_lock(self.directory):
+            meta = self._meta()
+            if meta is None:
+                self._build()
+            else:
+                first_rows = meta["dim"] is None
+                if self._append(meta, message_ids, project_ids, embeddings):
+                    if first_rows:
+                        self._write_meta(meta)
+        self.train_in_background()
+
+    def needs_training(self):
+        """Whether the index has grown enough to be (re)clustered."""
+        meta = self._meta()
+        if meta is None or meta["dim"] is None:
+            return False
+        rows = len(self._arrays(meta["dim"])["message_ids"])
+        if rows < settings.EMBEDDING_INDEX_MIN_TRAIN_ROWS:
+            return False
+        # Retrain once the index has doubled since the last training
+        return rows >= 2 * meta["trained_rows"]
+
+    def train(self):
+        """Cluster the index now (e.g. after a bulk rebuild)."""
+        meta = self._meta()
+        if meta is None or meta["dim"] is None:
+            return
+        arrays = self._arrays(meta["dim"])
+        rows = len(arrays["message_ids"])
+        if rows == 0:
+            return
+
+        # Fit on a sample without holding the lock, so that writers aren't
+        # blocked while k-means runs
+        vectors = arrays["vectors"].read(rows)
+        sample = vectors
+        if rows > TRAIN_SAMPLE_ROWS:
+            rng = np.random.default_rng(rows)
+            sample = vectors[rng.choice(rows, size=TRAIN_SAMPLE_ROWS, replace=False)]
+        k = max(int(np.sqrt(rows)), 1)
+        centroids = _kmeans(np.asarray(sample), min(k, len(sample)))
+
+        # Then assign every row, including any appended in the meantime
+        with directory_lock(self.directory):
+            meta = self._meta()
+            if meta is None or meta["dim"] != centroids.shape[1]:
+                # Cleared or rebuilt meanwhile
+                return
+            rows = len(arrays["message_ids"])
+            vectors = arrays["vectors"].read(rows)
+            arrays["centroids"].replace(centroids)
+            arrays["lists"].replace(np.argmax(vectors @ centroids.T, axis=1))
+            meta["trained_rows"] = rows
+            self._write_meta(meta)
+        logger.info(
+            f"Trained embedding index for user {self.user_id}: {rows} rows, {k} lists"
+        )
+
+    def train_in_background(self):
+        """Start training in a thread of this process if the index needs it."""
+        if not self.needs_training():
+            return
+        with _training_lock:
+            if self.user_id in _training:
+                return
+            _training.add(self.user_id)
+
+        def run():
+            try:
+                self.train()
+            except Exception as e:
+                logger.error(f"Error training embedding index: {e}")
+            finally:
+                with _training_lock:
+                    _training.discard(self.user_id)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def search(self, query_embedding, limit=3, exclude_project_id=None, nprobe=None):
+        """
+        Find the indexed messages most similar to a query.
+
+        Args:
+            query_embedding: Embedding vector of the query
+            limit: Maximum number of results
+            exclude_project_id: Optional project whose messages are skipped
+            nprobe: Number of clusters to scan (defaults to EMBEDDING_INDEX_NPROBE)
+
+        Returns:
+            List of (message_id, project_id, similarity) tuples, best first
+        """
+        meta = self._meta()
+        if meta is None or meta["dim"] is None:
+            return []
+
+        query = _normalize(query_embedding)
+        if query.shape[-1] != meta["dim"]:
+            return []
+
+        arrays = self._arrays(meta["dim"])
+        rows = len(arrays["message_ids"])
+        if rows == 0:
+            return []
+
+        message_ids = arrays["message_ids"].read(rows)
+        project_ids = arrays["project_ids"].read(rows)
+        vectors = arrays["vectors"].read(rows)
+
+        mask = np.ones(rows, dtype=bool)
+        centroids = arrays["centroids"].read()
+        if len(centroids):
+            nprobe = min(nprobe or settings.EMBEDDING_INDEX_NPROBE, len(centroids))
+            probes = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+            lists = arrays["lists"].read(rows)
+            mask = np.isin(lists, probes) | (lists == UNASSIGNED)
+        if exclude_project_id is not None:
+            mask &= project_ids != exclude_project_id
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+
+        scores = vectors[candidates] @ query
+        top = min(limit, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (
+                int(message_ids[candidates[i]]),
+                int(project_ids[candidates[i]]),
+                float(scores[i]),
+            )
+            for i in best
+        ]
+
+
+class ConversationEmbeddingStore(_EmbeddingFiles):
+    """
+    The assistant message embeddings of one conversation as a memory-mapped
+    matrix.
+
+    Rows are appended as new assistant messages appear, so a search in a hot
+    conversation reads no embeddings from the database and the matrix pages
+    are shared by all worker processes.
+    """
+
+    def __init__(self, conversation_id):
+        super().__init__("conversations", str(conversation_id))
+        self.conversation_id = conversation_id
+
+    def _arrays(self, dim):
+        return (
+            self._array("vectors.f32", dim, np.float32),
+            self._array("message_ids.i64", 1, np.int64),
+        )
+
+    def _pending_messages(self, synced_through):
+        return Message.objects.filter(
+            conversation_id=self.conversation_id,
+            sender="assistant",
+            id__gt=synced_through,
+        ).order_by("id")
+
+    def sync(self, embed):
+        """
+        Append embeddings for assistant messages added since the last sync.
+
+        Args:
+            embed: Callable returning the embedding for a message's text, used
+                for messages that have no stored embedding yet
+        """
+        meta = self._meta() or {}
+        if not self._pending_messages(meta.get("synced_through", 0)).exists():
+            return
+
+        with directory_lock(self.directory):
+            # Another worker may have synced while we waited for the lock
+            meta = self._meta() or {"dim": None, "synced_through": 0}
+            pending = self._pending_messages(meta["synced_through"]).select_related(
+                "embedding_obj"
+            )
+
+            message_ids, vectors = [], []
+            for msg in pending:
+                try:
+                    embedding = msg.embedding_obj.embedding
+                except MessageEmbedding.DoesNotExist:
+                    embedding = embed(msg.content)
+                    if not embedding:
+                        # Retry from this message on the next sync
+                        break
+                    MessageEmbedding.objects.create(message=msg, embedding=embedding)
+                message_ids.append(msg.id)
+                vectors.append(embedding)
+
+            if not message_ids:
+                return
+
+            vectors = _normalize(vectors)
+            dim = vectors.shape[1]
+            if meta["dim"] is None:
+                meta["dim"] = dim
+            elif meta["dim"] != dim:
+                # The embedding model changed; start over on the next sync
+                logger.warning(
+                    f"Embedding dimension changed for conversation {self.conversation_id}"
+                )
+                self._remove_files()
+                return
+
+            vector_array, id_array = self._arrays(dim)
+            # Message ids go last: readers use their count as the row count
+            vector_array.append(vectors)
+            id_array.append(message_ids)
+            meta["synced_through"] = message_ids[-1]
+            self._write_meta(meta)
+
+    def search(self, query_embedding, limit=3, exclude_ids=None):
+        """
+        Find the stored messages most similar to a query.
+
+        Args:
+            query_embedding: Embedding vector of the query
+            limit: Maximum number of results
+            exclude_ids: Optional collection of message IDs to leave out
+
+        Returns:
+            List of (message_id, similarity) tuples, best first
+        """
+        meta = self._meta()
+        if meta is None or meta["dim"] is None:
+            return []
+
+        query = _normalize(query_embedding)
+        if query.shape[-1] != meta["dim"]:
+            return []
+
+        vector_array, id_array = self._arrays(meta["dim"])
+        rows = len(id_array)
+        if rows == 0:
+            return []
+
+        message_ids = id_array.read(rows)
+        scores = vector_array.read(rows) @ query
+        if exclude_ids:
+            scores = np.where(np.isin(message_ids, list(exclude_ids)), -np.inf, scores)
+
+        top = min(limit, rows)
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            (int(message_ids[i]), float(scores[i]))
+            for i in best
+            if np.isfinite(scores[i])
+        ]
+
+
+def index_message_embeddings(embeddings):
+    """
+    Add MessageEmbedding rows for assistant messages to their owners' indexes.
+
+    Args:
+        embeddings: Iterable of MessageEmbedding objects
+    """
+    embeddings = list(embeddings)
+    owners = {
+        row["id"]: row
+        for row in Message.objects.filter(
+            id__in=[e.message_id for e in embeddings], sender="assistant"
+        ).values("id", "conversation__project_id", "conversation__project__user_id")
+    }
+
+    by_user = {}
+    for embedding in embeddings:
+        owner = owners.get(embedding.message_id)
+        if owner is None:
+            continue
+        rows = by_user.setdefault(owner["conversation__project__user_id"], ([], [], []))
+        rows[0].append(embedding.message_id)
+        rows[1].append(owner["conversation__project_id"])
+        rows[2].append(embedding.embedding)
+
+    for user_id, (message_ids, project_ids, vectors) in by_user.items():
+        UserEmbeddingIndex(user_id).add(message_ids, project_ids, vectors)
@@ -0,0 +1,104 @@
+import fcntl
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+# Per-process LRU cache of open memory maps: path -> (rows, array, inode).
+# Every map holds a file descriptor, so at most EMBEDDING_INDEX_MAX_OPEN_MAPS
+# are kept. An evicted map is unmapped and its descriptor closed as soon as no
+# reader still holds a view of it (closing it explicitly would leave such
+# views pointing at unmapped memory).
+_maps = OrderedDict()
+_maps_lock = threading.Lock()
+
+
+@contextmanager
+def directory_lock(directory):
+    """Exclusive cross-process lock for writers of the files in ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class AppendOnlyArray:
+    """
+    A growable 2-D array of fixed width stored as a raw binary file.
+
+    Rows are only ever appended (or the whole file atomically replaced), so
+    readers can memory-map the file without locking: the row count is derived
+    from the file size and pages are shared between worker processes through
+    the OS page cache.
+    """
+
+    def __init__(self, path, width, dtype=np.float32):
+        self.path = path
+        self.width = width
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = self.width * self.dtype.itemsize
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // self.row_bytes
+        except FileNotFoundError:
+            return 0
+
+    def append(self, rows):
+        """Append rows; callers serialize writers with ``directory_lock``."""
+        rows = np.ascontiguousarray(rows, dtype=self.dtype).reshape(-1, self.width)
+        with open(self.path, "ab") as f:
+            f.write(rows.tobytes())
+
+    def replace(self, rows):
+        """Atomically replace the whole file."""
+        rows = np.ascontiguousarray(rows, dtype=self.dtype).reshape(-1, self.width)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(rows.tobytes())
+        os.replace(tmp_path, self.path)
+        with _maps_lock:
+            _maps.pop(self.path, None)
+
+    def read(self, rows=None):
+        """
+        Return a read-only memory map of the first ``rows`` rows (all by default).
+
+        Width-1 arrays are returned as 1-D.
+        """
+        if rows is None:
+            rows = len(self)
+        if rows == 0:
+            return np.empty((0, self.width) if self.width > 1 else 0, dtype=self.dtype)
+
+        with _maps_lock:
+            cached = _maps.get(self.path)
+            if cached is not None:
+                _maps.move_to_end(self.path)
+        if cached is None or cached[0] < rows or cached[2] != _inode(self.path):
+            # The file grew or was replaced; map it again
+            mapped = np.memmap(self.path, dtype=self.dtype, mode="r")
+            total = mapped.shape[0] // self.width
+            mapped = mapped[: total * self.width].reshape(total, self.width)
+            cached = (total, mapped, _inode(self.path))
+            with _maps_lock:
+                _maps[self.path] = cached
+                _maps.move_to_end(self.path)
+                while len(_maps) > settings.EMBEDDING_INDEX_MAX_OPEN_MAPS:
+                    _maps.popitem(last=False)
+
+        array = cached[1][:rows]
+        return array[:, 0] if self.width == 1 else array
+
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,223 @@
+import gzip
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q, Sum
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from chat.ai_service import compact_conversation_summaries
+from chat.embedding_index import ConversationEmbeddingStore, UserEmbeddingIndex
+from chat.models import Conversation, ConversationSummary, Message, MessageEmbedding
+from chat.project_transfer import export_project
+from chat.response_cache import purge_expired_responses
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive and prune old messages (and their embeddings) that are already "
+        "covered by a conversation summary, keep only the latest summaries and "
+        "delete expired cached responses"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.RETENTION_MESSAGE_DAYS,
+            help="Prune messages older than this many days (0 keeps all messages)",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            default=settings.RETENTION_ARCHIVE_DIR,
+            help="Write pruned messages here as gzipped NDJSON project exports",
+        )
+        parser.add_argument(
+            "--keep-summaries",
+            type=int,
+            default=settings.SUMMARY_KEEP_COUNT,
+            help="Summaries to keep per conversation",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.RETENTION_BATCH_SIZE,
+            help="Messages deleted per statement",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be reclaimed without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        totals = {
+            "conversations": 0,
+            "messages": 0,
+            "embeddings": 0,
+            "content_bytes": 0,
+            "summaries": 0,
+            "archives": 0,
+        }
+        cutoff = None
+        if options["days"]:
+            cutoff = timezone.now() - timedelta(days=options["days"])
+
+        for conversation in self.conversations():
+            if cutoff is not None:
+                message_filter = self.prunable_messages(conversation, cutoff)
+                if message_filter is not None:
+                    pruned = self.prune(conversation, message_filter)
+                    if pruned["messages"]:
+                        totals["conversations"] += 1
+                        for key, value in pruned.items():
+                            totals[key] += value
+
+            totals["summaries"] += self.compact_summaries(conversation)
+
+        totals["cached_responses"] = purge_expired_responses(options["dry_run"])
+
+        prefix = "Would reclaim" if options["dry_run"] else "Reclaimed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}: {totals['messages']} messages "
+                f"({totals['content_bytes'] / 1024 / 1024:.1f} MB of text) in "
+                f"{totals['conversations']} conversations, "
+                f"{totals['embeddings']} embeddings, {totals['summaries']} summaries, "
+                f"{totals['cached_responses']} cached responses"
+            )
+        )
+        if totals["archives"]:
+            self.stdout.write(
+                f"Wrote {totals['archives']} archives to {options['archive_dir']}"
+            )
+
+    def conversations(self):
+        """Yield every conversation, fetched in batches by ID."""
+        conversations = Conversation.objects.select_related("project").order_by("id")
+        last_id = 0
+        while True:
+            batch = list(
+                conversations.filter(id__gt=last_id)[: self.options["batch_size"]]
+            )
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1].id
+
+    def prunable_messages(self, conversation, cutoff):
+        """
+        Return a filter for messages that can be pruned, or None.
+
+        Only messages older than the cutoff that an existing summary already
+        covers are eligible, and the recent history window is always kept.
+        """
+        latest_summary = (
+            ConversationSummary.objects.filter(conversation=conversation)
+            .order_by("-created_at", "-id")
+            .first()
+        )
+        if latest_summary is None:
+            # Nothing has been summarized; the messages are the only record
+            return None
+
+        if latest_summary.last_message_id is not None:
+            covered = Q(id__lte=latest_summary.last_message_id)
+        else:
+            # Summaries written before last_message_id was tracked
+            covered = Q(timestamp__lte=latest_summary.created_at)
+
+        message_filter = Q(conversation=conversation, timestamp__lt=cutoff) & covered
+        window = list(
+            Message.objects.filter(conversation=conversation)
+            .order_by("-timestamp", "-id")
+            .values_list("id", flat=True)[: conversation.project.history_window_size]
+        )
+        if window:
+            message_filter &= Q(id__lt=min(window))
+        return message_filter
+
+    def prune(self, conversation, message_filter):
+        """Archive and delete matching messages in bounded batches."""
+        pruned = {"messages": 0, "embeddings": 0, "content_bytes": 0, "archives": 0}
+        messages = Message.objects.filter(message_filter)
+
+        if self.options["dry_run"]:
+            pruned["messages"] = messages.count()
+            pruned["content_bytes"] = (
+                messages.aggregate(size=Sum(Length("content")))["size"] or 0
+            )
+            pruned["embeddings"] = MessageEmbedding.objects.filter(
+                message__in=messages
+            ).count()
+            return pruned
+
+        if not messages.exists():
+            return pruned
+
+        if self.options["archive_dir"]:
+            self.archive(conversation, message_filter)
+            pruned["archives"] = 1
+
+        while True:
+            ids = list(
+                messages.order_by("id").values_list("id", flat=True)[
+                    : self.options["batch_size"]
+                ]
+            )
+            if not ids:
+                break
+            batch = Message.objects.filter(id__in=ids)
+            pruned["content_bytes"] += (
+                batch.aggregate(size=Sum(Length("content")))["size"] or 0
+            )
+            # Embeddings go with their messages (on_delete=CASCADE)
+            _, deleted = batch.delete()
+            pruned["messages"] += deleted.get("chat.Message", 0)
+            pruned["embeddings"] += deleted.get("chat.MessageEmbedding", 0)
+            if self.options["sleep"]:
+                time.sleep(self.options["sleep"])
+
+        # Rebuilt from the remaining rows on the next search
+        stores = [ConversationEmbeddingStore(conversation.id)]
+        if pruned["embeddings"]:
+            stores.append(UserEmbeddingIndex(conversation.project.user_id))
+        for store in stores:
+            if os.path.isdir(store.directory):
+                store.clear()
+        return pruned
+
+    def archive(self, conversation, message_filter):
+        """Write the messages about to be pruned as an importable export."""
+        os.makedirs(self.options["archive_dir"], exist_ok=True)
+        path = os.path.join(
+            self.options["archive_dir"],
+            f"project-{conversation.project_id}-conversation-{conversation.id}-"
+            f"{timezone.now():%Y%m%d%H%M%S}.ndjson.gz",
+        )
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for line in export_project(
+                conversation.project,
+                chunk_size=self.options["batch_size"],
+                message_filter=message_filter,
+            ):
+                f.write(line)
+
+    def compact_summaries(self, conversation):
+        keep = self.options["keep_summaries"]
+        if self.options["dry_run"]:
+            count = ConversationSummary.objects.filter(
+                conversation=conversation
+            ).count()
+            return max(count - keep, 0)
+        return compact_conversation_summaries(conversation, keep=keep)
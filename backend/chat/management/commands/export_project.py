@@ -0,0 +1,45 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.models import Project
+from chat.project_transfer import export_project
+
+
+class Command(BaseCommand):
+    help = "Export a project with its conversation history as NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_id", type=int, help="ID of the project to export")
+        parser.add_argument(
+            "--output",
+            help="File to write (gzip-compressed if it ends in .gz); defaults to stdout",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(id=options["project_id"])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} does not exist")
+
+        output = options["output"]
+        if not output:
+            out = sys.stdout
+        elif output.endswith(".gz"):
+            out = gzip.open(output, "wt", encoding="utf-8")
+        else:
+            out = open(output, "w", encoding="utf-8")
+
+        try:
+            for line in export_project(project, chunk_size=options["batch_size"]):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if output:
+            self.stdout.write(
+                self.style.SUCCESS(f"Exported project {project.id} to {output}")
+            )
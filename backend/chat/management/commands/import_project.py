@@ -0,0 +1,37 @@
+import gzip
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.project_transfer import import_project
+
+
+class Command(BaseCommand):
+    help = "Import a project exported with export_project"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON export (optionally .gz)")
+        parser.add_argument(
+            "--user", required=True, help="Username that will own the project"
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        path = options["path"]
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                project = import_project(f, user, batch_size=options["batch_size"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Import failed: {e}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported project {project.id} ({project.name}) for {user.username}"
+            )
+        )
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+
+from chat.ai_service import get_message_embedding
+from chat.embedding_index import UserEmbeddingIndex
+from chat.models import Message, MessageEmbedding, Project
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user cross-project embedding indexes from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, action="append", help="Only rebuild this user ID"
+        )
+        parser.add_argument(
+            "--embed-missing",
+            action="store_true",
+            help="Create embeddings for assistant messages that have none (calls OpenAI)",
+        )
+        parser.add_argument(
+            "--train",
+            action="store_true",
+            help="Only retrain indexes that have doubled since they were last "
+            "trained, without rebuilding them",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_ids = options["user"] or list(
+            Project.objects.values_list("user_id", flat=True).distinct()
+        )
+        batch_size = options["batch_size"]
+
+        if options["train"]:
+            for user_id in user_ids:
+                index = UserEmbeddingIndex(user_id)
+                if index.needs_training():
+                    index.train()
+                    self.stdout.write(
+                        f"User {user_id}: trained {len(index)} embeddings"
+                    )
+            return
+
+        for user_id in user_ids:
+            messages = Message.objects.filter(
+                conversation__project__user_id=user_id, sender="assistant"
+            )
+
+            if options["embed_missing"]:
+                missing = messages.filter(embedding_obj__isnull=True).only(
+                    "id", "content"
+                )
+                created = 0
+                for msg in missing.iterator(chunk_size=batch_size):
+                    embedding = get_message_embedding(msg.content)
+                    if embedding:
+                        # Not indexed by the save signal; the rebuild below covers it
+                        MessageEmbedding.objects.bulk_create(
+                            [MessageEmbedding(message=msg, embedding=embedding)]
+                        )
+                        created += 1
+                self.stdout.write(f"User {user_id}: embedded {created} messages")
+
+            index = UserEmbeddingIndex(user_id)
+            index.rebuild()
+            index.train()
+            self.stdout.write(
+                self.style.SUCCESS(f"User {user_id}: indexed {len(index)} embeddings")
+            )
@@ -0,0 +1,323 @@
+import json
+import random
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.models import Project, UserProfile
+
+USERNAME_PREFIX = "loadtest-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay example_queries.txt through /api/send-message/ at a fixed arrival "
+        "rate against a fake OpenAI endpoint and report latency, errors and "
+        "token accounting"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queries",
+            default=str(Path(settings.BASE_DIR) / "example_queries.txt"),
+            help="File with one query per line",
+        )
+        parser.add_argument("--users", type=int, default=5)
+        parser.add_argument(
+            "--rate", type=float, default=2.0, help="Mean arrivals per second"
+        )
+        parser.add_argument(
+            "--requests", type=int, default=50, help="Total requests to send"
+        )
+        parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            default=32,
+            help="Requests allowed in flight before arrivals queue client-side",
+        )
+        parser.add_argument(
+            "--url", help="Replay against a running server instead of in-process"
+        )
+        parser.add_argument(
+            "--openai-base-url",
+            help="Use an already running fake OpenAI endpoint (in-process mode)",
+        )
+        parser.add_argument(
+            "--fake-latency",
+            type=float,
+            default=0.5,
+            help="Latency of the fake OpenAI endpoint started for in-process runs",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--output", help="Write the JSON report here")
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Keep the synthetic users and projects afterwards",
+        )
+
+    def handle(self, *args, **options):
+        # Benchmark helpers live next to manage.py
+        from benchmarks.utils import latency_stats, write_report
+
+        queries = self.load_queries(options["queries"])
+        rng = random.Random(options["seed"])
+
+        fake_server = None
+        if not options["url"]:
+            fake_server = self.use_fake_openai(options)
+
+        users, password = self.create_users(options["users"])
+        try:
+            send = (
+                self.live_sender(options["url"], password)
+                if options["url"]
+                else self.in_process_sender()
+            )
+            results, elapsed = self.replay(send, users, queries, rng, options)
+            accounting = self.check_token_accounting(users, results)
+        finally:
+            if not options["keep_data"]:
+                User.objects.filter(id__in=[u["id"] for u in users]).delete()
+            if fake_server is not None:
+                fake_server.shutdown()
+
+        ok = [r for r in results if r["status"] == 200]
+        status_counts = {}
+        for r in results:
+            status_counts[str(r["status"])] = status_counts.get(str(r["status"]), 0) + 1
+        sample_errors = sorted({str(r["error"]) for r in results if r["error"]})[:5]
+
+        write_report(
+            {
+                "benchmark": "replay_queries",
+                "config": {
+                    "mode": "live" if options["url"] else "in-process",
+                    "url": options["url"],
+                    "queries": len(queries),
+                    "users": options["users"],
+                    "rate": options["rate"],
+                    "requests": options["requests"],
+                    "fake_latency_s": (
+                        None if options["url"] else options["fake_latency"]
+                    ),
+                },
+                "elapsed_s": round(elapsed, 3),
+                "achieved_rate": round(len(results) / elapsed, 3) if elapsed else None,
+                "statuses": status_counts,
+                "error_rate": round(1 - len(ok) / len(results), 4) if results else None,
+                "sample_errors": sample_errors,
+                "latency": latency_stats([r["latency"] for r in results]),
+                "latency_ok": latency_stats([r["latency"] for r in ok]),
+                "schedule_lag": latency_stats([r["lag"] for r in results]),
+                "token_accounting": accounting,
+            },
+            options["output"],
+        )
+        # Fail the run so it can gate capacity changes
+        if accounting["mismatched_users"]:
+            raise CommandError(
+                f"Token accounting mismatch for {accounting['mismatched_users']} user(s)"
+            )
+
+    def load_queries(self, path):
+        try:
+            with open(path) as f:
+                queries = [line.strip().strip('"') for line in f if line.strip()]
+        except OSError as e:
+            raise CommandError(f"Could not read queries: {e}")
+        if not queries:
+            raise CommandError(f"No queries found in {path}")
+        return queries
+
+    def use_fake_openai(self, options):
+        """Point the OpenAI client at a fake endpoint; returns a server to stop."""
+        from openai import OpenAI
+
+        from chat import ai_service
+
+        server = None
+        base_url = options["openai_base_url"]
+        if not base_url:
+            from benchmarks.fake_openai import start_fake_openai
+
+            server, base_url = start_fake_openai(latency=options["fake_latency"])
+
+        # Replaces the shared client (or the one get_client() would build)
+        ai_service.client = OpenAI(api_key="replay", base_url=base_url)
+        return server
+
+    def create_users(self, count):
+        """Create synthetic users, each with one project and a known balance."""
+        password = secrets.token_urlsafe(12)
+        run_id = secrets.token_hex(3)
+        users = []
+        for i in range(count):
+            user = User.objects.create_user(
+                f"{USERNAME_PREFIX}{run_id}-{i}", password=password
+            )
+            profile = UserProfile.objects.get(user=user)
+            project = Project.objects.create(
+                name=f"Load test {i}", user=user, board_type="Arduino Uno"
+            )
+            users.append(
+                {
+                    "id": user.id,
+                    "username": user.username,
+                    "project_id": project.id,
+                    "initial_tokens": profile.tokens_remaining,
+                }
+            )
+        return users, password
+
+    def in_process_sender(self):
+        from django.test import Client
+
+        local = threading.local()
+
+        def send(user, content):
+            clients = getattr(local, "clients", None)
+            if clients is None:
+                clients = local.clients = {}
+            if user["id"] not in clients:
+                # "localhost" is always in ALLOWED_HOSTS
+                client = Client(SERVER_NAME="localhost")
+                client.force_login(User.objects.get(id=user["id"]))
+                clients[user["id"]] = client
+            response = clients[user["id"]].post(
+                "/api/send-message/",
+                {"content": content, "project_id": user["project_id"]},
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY=uuid.uuid4().hex,
+            )
+            return (
+                response.status_code,
+                self.parse_json(response.content),
+                "Idempotent-Replayed" in response,
+            )
+
+        return send
+
+    def live_sender(self, url, password):
+        import urllib.error
+        import urllib.request
+
+        from benchmarks.utils import live_login
+
+        url = url.rstrip("/")
+        local = threading.local()
+
+        def send(user, content):
+            sessions = getattr(local, "sessions", None)
+            if sessions is None:
+                sessions = local.sessions = {}
+            if user["id"] not in sessions:
+                sessions[user["id"]] = live_login(url, user["username"], password)
+            opener, csrf = sessions[user["id"]]
+            request = urllib.request.Request(
+                f"{url}/api/send-message/",
+                data=json.dumps(
+                    {"content": content, "project_id": user["project_id"]}
+                ).encode(),
+                headers={
+                    "Content-Type": "application/json",
+                    "X-CSRFToken": csrf,
+                    "Referer": f"{url}/",
+                    "Idempotency-Key": uuid.uuid4().hex,
+                },
+            )
+            try:
+                with opener.open(request) as response:
+                    replayed = response.headers.get("Idempotent-Replayed") is not None
+                    return response.status, self.parse_json(response.read()), replayed
+            except urllib.error.HTTPError as e:
+                return e.code, self.parse_json(e.read()), False
+
+        return send
+
+    @staticmethod
+    def parse_json(body):
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {}
+
+    def replay(self, send, users, queries, rng, options):
+        """Send requests with exponential inter-arrival times (open loop)."""
+        results = []
+        lock = threading.Lock()
+
+        def fire(scheduled, user, content):
+            started = time.perf_counter()
+            try:
+                status, data, replayed = send(user, content)
+            except Exception as e:
+                status, data, replayed = "exception", {"error": str(e)}, False
+            finished = time.perf_counter()
+            with lock:
+                results.append(
+                    {
+                        "user_id": user["id"],
+                        "status": status,
+                        "latency": finished - started,
+                        "lag": started - scheduled,
+                        "tokens_used": data.get("tokens_used"),
+                        "replayed": replayed,
+                        "tokens_remaining": data.get("tokens_remaining"),
+                        # 429s (Throttled) carry "detail", the views' own errors "error"
+                        "error": (
+                            data.get("error") or data.get("detail")
+                            if status != 200
+                            else None
+                        ),
+                    }
+                )
+
+        pool = ThreadPoolExecutor(max_workers=options["max_in_flight"])
+        started = time.perf_counter()
+        next_arrival = started
+        for i in range(options["requests"]):
+            next_arrival += rng.expovariate(options["rate"])
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, next_arrival, users[i % len(users)], rng.choice(queries))
+        pool.shutdown(wait=True)
+        return results, time.perf_counter() - started
+
+    def check_token_accounting(self, users, results):
+        """
+        Compare each user's final balance with their starting balance minus
+        the tokens reported as used by successful responses. Replayed
+        responses report the tokens of the request they repeat and weren't
+        billed again, so they are left out.
+        """
+        report = {"checked_users": len(users), "mismatched_users": 0, "users": []}
+        for user in users:
+            used = sum(
+                r["tokens_used"] or 0
+                for r in results
+                if r["user_id"] == user["id"]
+                and r["status"] == 200
+                and not r["replayed"]
+            )
+            expected = max(user["initial_tokens"] - used, 0)
+            actual = UserProfile.objects.get(user_id=user["id"]).tokens_remaining
+            if actual != expected:
+                report["mismatched_users"] += 1
+            report["users"].append(
+                {
+                    "username": user["username"],
+                    "tokens_used": used,
+                    "expected_remaining": expected,
+                    "actual_remaining": actual,
+                }
+            )
+        return report
@@ -1,27 +1,69 @@
 # In chat/middleware.py
+from django.conf import settings
 from django.shortcuts import redirect
-from django.urls import resolve, reverse
+from django.urls import Resolver404, resolve
 from .models import SiteSettings
+from .tracing import log_trace, observe, server_timing_header, start_trace
 
 
 class BetaRegistrationMiddleware:
+    # Paths that can never be the signup page; skip URL resolution for them
+    SKIP_PREFIXES = ("/api/", "/admin/")
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.skip_prefixes = self.SKIP_PREFIXES + (settings.STATIC_URL,)
 
     def __call__(self, request):
-        # Check if we're trying to access the signup page
-        url_name = resolve(request.path_info).url_name
-
-        if url_name == "signup" and not request.user.is_authenticated:
-            # Get or create settings
-            settings, created = SiteSettings.objects.get_or_create(id=1)
+        if (
+            not request.path_info.startswith(self.skip_prefixes)
+            and self.is_signup_request(request)
+            and not request.user.is_authenticated
+        ):
+            # Cached singleton settings
+            site_settings = SiteSettings.load()
 
             # Check if beta is closed or full
             if (
-                not settings.beta_registration_open
-                or settings.registered_users_count >= settings.max_beta_users
+                not site_settings.beta_registration_open
+                or site_settings.registered_users_count >= site_settings.max_beta_users
             ):
                 return redirect("beta_closed")
 
         response = self.get_response(request)
         return response
+
+    @staticmethod
+    def is_signup_request(request):
+        # Check if we're trying to access the signup page
+        try:
+            return resolve(request.path_info).url_name == "signup"
+        except Resolver404:
+            return False
+
+
+class ServerTimingMiddleware:
+    """Trace each request and report its spans in a Server-Timing header"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.TRACING_ENABLED:
+            return self.get_response(request)
+
+        with start_trace(request.path_info) as trace:
+            response = self.get_response(request)
+
+        observe("request", trace.duration)
+        response["Server-Timing"] = server_timing_header(trace)
+
+        match = request.resolver_match
+        log_trace(
+            trace,
+            method=request.method,
+            view=match.view_name if match else None,
+            status=response.status_code,
+            user_id=request.user.id if hasattr(request, "user") else None,
+        )
+        return response
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0016_project_board_fqbn"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CachedResponse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(db_index=True, max_length=50)),
+                ("board_type", models.CharField(blank=True, max_length=100)),
+                ("question", models.TextField()),
+                ("embedding", models.JSONField()),
+                ("response", models.TextField()),
+                ("hit_count", models.IntegerField(default=0)),
+                ("last_hit_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, db_index=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0017_cachedresponse"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversationsummary",
+            name="last_message_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
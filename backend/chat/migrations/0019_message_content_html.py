@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0018_conversationsummary_last_message_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="content_html",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0019_message_content_html"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="model",
+            field=models.CharField(blank=True, default="", max_length=50),
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="route",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+    ]
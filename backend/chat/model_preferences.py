@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import get_or_set, make_key
+from .models import Project, UserProfile
+
+# Default fallback model
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Fields that influence model selection; saves touching only other fields
+# (e.g. the token balance) leave cached entries alone.
+PROFILE_MODEL_FIELDS = {"default_query_model", "default_summary_model"}
+PROJECT_MODEL_FIELDS = {"query_model", "summary_model"}
+
+
+class ModelSettings:
+    """The query and summary models resolved for a user/project pair."""
+
+    def __init__(self, query_model, summary_model):
+        self.query_model = query_model
+        self.summary_model = summary_model
+
+    def model_for(self, is_summary=False):
+        return self.summary_model if is_summary else self.query_model
+
+    def __repr__(self):
+        return (
+            f"ModelSettings(query={self.query_model!r}, summary={self.summary_model!r})"
+        )
+
+
+def _profile_key(user_id):
+    return make_key("model_settings", "profile", user_id)
+
+
+def _project_key(project_id):
+    return make_key("model_settings", "project", project_id)
+
+
+def _load_model_settings(user_id, project_id):
+    """Read the user's defaults and the project's overrides through the cache."""
+    profile = get_or_set(
+        _profile_key(user_id),
+        lambda: UserProfile.objects.filter(user_id=user_id)
+        .values("default_query_model", "default_summary_model")
+        .first(),
+        settings.MODEL_SETTINGS_CACHE_TTL,
+    )
+    if profile is None:
+        return ModelSettings(DEFAULT_MODEL, DEFAULT_MODEL)
+
+    query_model = profile["default_query_model"] or DEFAULT_MODEL
+    summary_model = profile["default_summary_model"] or DEFAULT_MODEL
+
+    if project_id:
+        project = get_or_set(
+            _project_key(project_id),
+            lambda: Project.objects.filter(id=project_id)
+            .values("query_model", "summary_model")
+            .first(),
+            settings.MODEL_SETTINGS_CACHE_TTL,
+        )
+        if project is not None:
+            # A project-specific model takes precedence over the user default
+            query_model = project["query_model"] or query_model
+            summary_model = project["summary_model"] or summary_model
+
+    return ModelSettings(query_model, summary_model)
+
+
+def resolve_model_settings(user, project_id=None):
+    """
+    Resolve which models to use for a user and (optionally) a project.
+
+    The user's defaults and the project's overrides are kept in the shared
+    cache for ``MODEL_SETTINGS_CACHE_TTL`` seconds and dropped as soon as the
+    UserProfile or Project is saved, so repeat lookups cost no queries and
+    every worker sees a change right away.
+
+    Args:
+        user: The user making the request
+        project_id: Optional project ID
+
+    Returns:
+        ModelSettings
+    """
+    return _load_model_settings(user.pk, int(project_id) if project_id else None)
+
+
+def invalidate_model_settings(user_id=None, project_id=None):
+    """Drop cached entries for a user and/or a project."""
+    keys = []
+    if user_id is not None:
+        keys.append(_profile_key(user_id))
+    if project_id is not None:
+        keys.append(_project_key(project_id))
+    cache.delete_many(keys)
+
+
+def _touches(update_fields, model_fields):
+    return update_fields is None or bool(model_fields & set(update_fields))
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, update_fields=None, **kwargs):
+    """Forget cached model choices when a user's defaults change"""
+    if _touches(update_fields, PROFILE_MODEL_FIELDS):
+        invalidate_model_settings(user_id=instance.user_id)
+
+
+@receiver(post_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    invalidate_model_settings(user_id=instance.user_id)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, update_fields=None, **kwargs):
+    """Forget cached model choices when a project's overrides change"""
+    if _touches(update_fields, PROJECT_MODEL_FIELDS):
+        invalidate_model_settings(project_id=instance.id)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    invalidate_model_settings(project_id=instance.id)
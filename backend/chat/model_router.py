@@ -0,0 +1,158 @@
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough USD price per million input tokens, used to only ever route a
+# prompt to a cheaper model than the one the user picked
+MODEL_COSTS = {
+    "gpt-4": 30.0,
+    "gpt-4o": 2.5,
+    "gpt-3.5-turbo": 0.5,
+    "gpt-4o-mini": 0.15,
+}
+
+# How a response was produced
+ROUTE_PRIMARY = "primary"  # the user's model
+ROUTE_FAST = "fast"  # a cheaper model for a short, simple prompt
+ROUTE_HEDGE = "hedge"  # a second request sent after the first was slow
+ROUTE_FALLBACK = "fallback"  # the first request failed with a retryable error
+ROUTE_CACHE = "cache"  # served from the response cache
+ROUTE_ERROR = "error"  # every attempt failed
+
+Route = namedtuple("Route", ["route", "model"])
+
+# Hedged requests run here so the caller can stop waiting on a slow one
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="model-router")
+
+# Per-process counters: (route, model) -> requests
+_route_counts = {}
+_route_counts_lock = threading.Lock()
+
+
+def record_route(route):
+    """Count a served request by route and model."""
+    with _route_counts_lock:
+        _route_counts[route] = _route_counts.get(route, 0) + 1
+
+
+def get_route_metrics():
+    """Return a copy of the per-process {Route: count} counters."""
+    with _route_counts_lock:
+        return dict(_route_counts)
+
+
+def choose_model(model, prompt):
+    """
+    Pick the model for a prompt.
+
+    Short prompts without code go to MODEL_ROUTER_FAST_MODEL when it is
+    cheaper than the user's model.
+
+    Returns:
+        Route
+    """
+    fast_model = settings.MODEL_ROUTER_FAST_MODEL
+    if (
+        fast_model
+        and fast_model != model
+        and MODEL_COSTS.get(fast_model, float("inf"))
+        < MODEL_COSTS.get(model, float("inf"))
+        and len(prompt) <= settings.MODEL_ROUTER_FAST_MAX_CHARS
+        and "```" not in prompt
+    ):
+        return Route(ROUTE_FAST, fast_model)
+    return Route(ROUTE_PRIMARY, model)
+
+
+def is_retryable(error):
+    """Timeouts, connection errors, rate limits and 5xx responses."""
+    # Imported here so that importing the router doesn't load the SDK
+    import openai
+
+    if isinstance(
+        error,
+        (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError),
+    ):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _create(client, model, messages, **kwargs):
+    return client.with_options(
+        timeout=settings.MODEL_ROUTER_TIMEOUT,
+        max_retries=settings.MODEL_ROUTER_MAX_RETRIES,
+    ).chat.completions.create(model=model, messages=messages, **kwargs)
+
+
+def _create_hedged(client, route, messages, **kwargs):
+    """
+    Send the request and, if it is still running after
+    MODEL_ROUTER_HEDGE_AFTER seconds, a second one to the fallback model;
+    the first successful response wins. The slower request is not
+    cancelled and is still billed by the provider.
+    """
+    primary = _executor.submit(_create, client, route.model, messages, **kwargs)
+    try:
+        return primary.result(timeout=settings.MODEL_ROUTER_HEDGE_AFTER), route
+    except FutureTimeoutError:
+        pass
+
+    hedge_route = Route(
+        ROUTE_HEDGE, settings.MODEL_ROUTER_FALLBACK_MODEL or route.model
+    )
+    pending = {
+        primary: route,
+        _executor.submit(
+            _create, client, hedge_route.model, messages, **kwargs
+        ): hedge_route,
+    }
+    error = None
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            served_by = pending.pop(future)
+            try:
+                return future.result(), served_by
+            except Exception as e:
+                error = e
+    raise error
+
+
+def complete_chat(client, model, messages, prompt, **kwargs):
+    """
+    Create a chat completion, choosing the model and recovering from
+    slow or failed requests.
+
+    Args:
+        client: OpenAI client
+        model: The model the user selected
+        messages: Chat messages to send
+        prompt: The user's message, used to classify the request
+        **kwargs: Passed on to ``chat.completions.create``
+
+    Returns:
+        Tuple of (completion, Route)
+    """
+    route = choose_model(model, prompt)
+    try:
+        if settings.MODEL_ROUTER_HEDGE_AFTER:
+            completion, route = _create_hedged(client, route, messages, **kwargs)
+        else:
+            completion = _create(client, route.model, messages, **kwargs)
+    except Exception as e:
+        if not is_retryable(e):
+            raise
+        # Retry once, on the fallback model when one is configured
+        logger.warning(f"{route.model} failed ({e.__class__.__name__}); falling back")
+        route = Route(ROUTE_FALLBACK, settings.MODEL_ROUTER_FALLBACK_MODEL or model)
+        completion = _create(client, route.model, messages, **kwargs)
+
+    record_route(route)
+    return completion, route
@@ -1,10 +1,13 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.conf import settings
 
+from .cache import get_or_set, make_key
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -46,7 +49,7 @@ class UserProfile(models.Model):
         if now.date() > self.last_token_reset.date():
             self.tokens_remaining = 100000  # Reset to daily limit
             self.last_token_reset = now
-            self.save()
+            self.save(update_fields=["tokens_remaining", "last_token_reset"])
             return True
         return False
 
@@ -98,6 +101,18 @@ class Project(models.Model):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def list_cache_key(user_id):
+        """Cache key for a user's serialized project list"""
+        return make_key("project_list", user_id)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def clear_project_list_cache(sender, instance, **kwargs):
+    """Drop the owner's cached project list whenever one of their projects changes"""
+    cache.delete(Project.list_cache_key(instance.user_id))
+
 
 class Conversation(models.Model):
     """Model to store the conversation"""
@@ -122,6 +137,10 @@ class Message(models.Model):
     )
     sender = models.CharField(max_length=10, choices=SENDER_CHOICES)
     content = models.TextField()
+    content_html = models.TextField(blank=True, default="")  # Rendered markdown
+    # Model and router route that produced an assistant message
+    model = models.CharField(max_length=50, blank=True, default="")
+    route = models.CharField(max_length=20, blank=True, default="")
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -139,6 +158,9 @@ class ConversationSummary(models.Model):
     )
     content = models.TextField()
     message_count = models.IntegerField()  # Number of messages this summary covers
+    last_message_id = models.BigIntegerField(
+        blank=True, null=True
+    )  # ID of the newest message folded into this summary
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -158,7 +180,25 @@ class MessageEmbedding(models.Model):
         return f"Embedding for message {self.message.id}"
 
 
+class CachedResponse(models.Model):
+    """Model to store answers that can be reused for near-identical questions"""
+
+    model = models.CharField(max_length=50, db_index=True)
+    board_type = models.CharField(max_length=100, blank=True)
+    question = models.TextField()
+    embedding = models.JSONField()  # Embedding of the question
+    response = models.TextField()
+    hit_count = models.IntegerField(default=0)
+    last_hit_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Cached {self.model} answer: {self.question[:50]}..."
+
+
 class SiteSettings(models.Model):
+    CACHE_KEY = make_key("site_settings")
+
     registered_users_count = models.IntegerField(default=0)
     max_beta_users = models.IntegerField(default=settings.MAX_BETA_USERS)
     beta_registration_open = models.BooleanField(default=True)
@@ -171,3 +211,19 @@ class SiteSettings(models.Model):
         return (
             f"Site Settings ({self.registered_users_count}/{self.max_beta_users} users)"
         )
+
+    @classmethod
+    def load(cls):
+        """Return the singleton settings row, served from the cache when possible"""
+        return get_or_set(
+            cls.CACHE_KEY,
+            lambda: cls.objects.get_or_create(id=1)[0],
+            settings.SITE_SETTINGS_CACHE_TTL,
+        )
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+def clear_site_settings_cache(sender, **kwargs):
+    """Drop the cached singleton whenever it changes"""
+    cache.delete(SiteSettings.CACHE_KEY)
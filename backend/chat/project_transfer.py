@@ -0,0 +1,451 @@
+import json
+import logging
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    Conversation,
+    ConversationSummary,
+    Message,
+    MessageEmbedding,
+    Project,
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT = "boardboost-project"
+EXPORT_VERSION = 1
+
+# Validated lines are kept in memory up to this size, then spill to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+PROJECT_FIELDS = [
+    "name",
+    "board_fqbn",
+    "board_type",
+    "components_text",
+    "libraries_text",
+    "description",
+    "history_window_size",
+    "query_model",
+    "summary_model",
+]
+
+# Fields every record of a type must have, with their JSON types
+REQUIRED_FIELDS = {
+    "project": {"name": str},
+    "conversation": {"id": int, "created_at": str},
+    "message": {
+        "id": int,
+        "conversation": int,
+        "sender": str,
+        "content": str,
+        "timestamp": str,
+    },
+    "summary": {
+        "conversation": int,
+        "content": str,
+        "message_count": int,
+        "created_at": str,
+    },
+}
+# Fields that may be missing or null
+OPTIONAL_FIELDS = {
+    "project": {
+        "board_fqbn": str,
+        "board_type": str,
+        "components_text": str,
+        "libraries_text": str,
+        "description": str,
+        "history_window_size": int,
+        "query_model": str,
+        "summary_model": str,
+    },
+    "conversation": {},
+    "message": {"embedding": list},
+    "summary": {"last_message_id": int},
+}
+DATETIME_FIELDS = {"created_at", "updated_at", "timestamp"}
+SENDERS = {sender for sender, _ in Message.SENDER_CHOICES}
+
+
+def _line(record):
+    return json.dumps(record, separators=(",", ":"), default=str) + "\n"
+
+
+def _datetime(value):
+    return parse_datetime(value) if value else None
+
+
+def export_project(project, chunk_size=None, message_filter=None):
+    """
+    Serialize a project with its conversations, messages, embeddings and
+    summaries as NDJSON.
+
+    Rows are streamed from the database in chunks, so memory use does not
+    grow with the size of the history.
+
+    Args:
+        project: The Project to export
+        chunk_size: Rows fetched per database round trip
+        message_filter: Optional Q object restricting the exported messages
+
+    Returns:
+        Generator of newline-terminated JSON lines
+    """
+    chunk_size = chunk_size or settings.PROJECT_TRANSFER_BATCH_SIZE
+
+    yield _line(
+        {
+            "type": "header",
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "exported_at": timezone.now().isoformat(),
+        }
+    )
+
+    record = {field: getattr(project, field) for field in PROJECT_FIELDS}
+    record.update(
+        type="project",
+        created_at=project.created_at.isoformat(),
+        updated_at=project.updated_at.isoformat(),
+    )
+    yield _line(record)
+
+    conversations = Conversation.objects.filter(project=project).order_by("id")
+    for conversation in conversations.values("id", "created_at"):
+        yield _line(
+            {
+                "type": "conversation",
+                "id": conversation["id"],
+                "created_at": conversation["created_at"].isoformat(),
+            }
+        )
+
+    # Messages carry their embedding inline so an import needs no API calls
+    messages = Message.objects.filter(conversation__project=project)
+    if message_filter is not None:
+        messages = messages.filter(message_filter)
+    messages = messages.order_by("id").values(
+        "id",
+        "conversation_id",
+        "sender",
+        "content",
+        "timestamp",
+        "embedding_obj__embedding",
+    )
+    for message in messages.iterator(chunk_size=chunk_size):
+        yield _line(
+            {
+                "type": "message",
+                "id": message["id"],
+                "conversation": message["conversation_id"],
+                "sender": message["sender"],
+                "content": message["content"],
+                "timestamp": message["timestamp"].isoformat(),
+                "embedding": message["embedding_obj__embedding"],
+            }
+        )
+
+    # Summaries come last: they refer to messages by ID
+    summaries = (
+        ConversationSummary.objects.filter(conversation__project=project)
+        .order_by("id")
+        .values(
+            "conversation_id",
+            "content",
+            "message_count",
+            "last_message_id",
+            "created_at",
+        )
+    )
+    for summary in summaries.iterator(chunk_size=chunk_size):
+        yield _line(
+            {
+                "type": "summary",
+                "conversation": summary["conversation_id"],
+                "content": summary["content"],
+                "message_count": summary["message_count"],
+                "last_message_id": summary["last_message_id"],
+                "created_at": summary["created_at"].isoformat(),
+            }
+        )
+
+
+class _Importer:
+    """Collects validated records into batches and writes them with bulk_create."""
+
+    def __init__(self, user, batch_size):
+        self.user = user
+        self.batch_size = batch_size
+        self.project = None
+        self.conversation_ids = {}
+        # Old -> new message IDs, needed to remap summary.last_message_id
+        self.message_ids = {}
+        self.messages = []
+        self.summaries = []
+
+    def add(self, record):
+        kind = record["type"]
+        if kind == "project":
+            self.add_project(record)
+        elif kind == "conversation":
+            conversation = Conversation.objects.create(project=self.project)
+            Conversation.objects.filter(id=conversation.id).update(
+                created_at=_datetime(record["created_at"])
+            )
+            self.conversation_ids[record["id"]] = conversation.id
+        elif kind == "message":
+            self.messages.append(record)
+            if len(self.messages) >= self.batch_size:
+                self.flush_messages()
+        elif kind == "summary":
+            self.summaries.append(record)
+            if len(self.summaries) >= self.batch_size:
+                self.flush_summaries()
+
+    def add_project(self, record):
+        # Missing fields get the model defaults
+        self.project = Project.objects.create(
+            user=self.user,
+            **{
+                field: record[field]
+                for field in PROJECT_FIELDS
+                if record.get(field) is not None
+            },
+        )
+        # auto_now fields ignore explicit values on save()
+        Project.objects.filter(id=self.project.id).update(
+            created_at=_datetime(record.get("created_at")) or self.project.created_at,
+            updated_at=_datetime(record.get("updated_at")) or self.project.updated_at,
+        )
+
+    def flush_messages(self):
+        if not self.messages:
+            return
+        messages = [
+            Message(
+                conversation_id=self.conversation_ids[record["conversation"]],
+                sender=record["sender"],
+                content=record["content"],
+            )
+            for record in self.messages
+        ]
+        Message.objects.bulk_create(messages)
+
+        # bulk_create applies auto_now_add, so restore the original timestamps
+        for message, record in zip(messages, self.messages):
+            message.timestamp = _datetime(record["timestamp"])
+            self.message_ids[record["id"]] = message.id
+        Message.objects.bulk_update(messages, ["timestamp"])
+
+        MessageEmbedding.objects.bulk_create(
+            [
+                MessageEmbedding(message=message, embedding=record["embedding"])
+                for message, record in zip(messages, self.messages)
+                if record.get("embedding")
+            ]
+        )
+        self.messages = []
+
+    def flush_summaries(self):
+        if not self.summaries:
+            return
+        # Every message an exported summary refers to precedes it
+        self.flush_messages()
+        summaries = [
+            ConversationSummary(
+                conversation_id=self.conversation_ids[record["conversation"]],
+                content=record["content"],
+                message_count=record["message_count"],
+                last_message_id=self.message_ids.get(record["last_message_id"]),
+            )
+            for record in self.summaries
+        ]
+        ConversationSummary.objects.bulk_create(summaries)
+        for summary, record in zip(summaries, self.summaries):
+            summary.created_at = _datetime(record["created_at"])
+        ConversationSummary.objects.bulk_update(summaries, ["created_at"])
+        self.summaries = []
+
+
+def _check_record(record):
+    """
+    Check that a record can be written without a database error.
+
+    Raises:
+        ValueError: If the record has a missing or malformed field
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Record is not a JSON object")
+    kind = record.get("type")
+    if kind not in REQUIRED_FIELDS:
+        raise ValueError(f"Unknown record type: {kind!r}")
+
+    for field in REQUIRED_FIELDS[kind]:
+        if field not in record:
+            raise ValueError(f"{kind.capitalize()} record is missing field '{field}'")
+
+    fields = {**OPTIONAL_FIELDS[kind], **REQUIRED_FIELDS[kind]}
+    for field, field_type in fields.items():
+        value = record.get(field)
+        if value is None and field not in REQUIRED_FIELDS[kind]:
+            continue
+        # bool is a subclass of int
+        if not isinstance(value, field_type) or isinstance(value, bool):
+            raise ValueError(f"Field '{field}' must be a {field_type.__name__}")
+
+    for field in DATETIME_FIELDS & record.keys():
+        if record[field] is None and field not in REQUIRED_FIELDS[kind]:
+            continue
+        try:
+            valid = _datetime(record[field]) is not None
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise ValueError(f"Field '{field}' is not a valid date and time")
+
+    if kind == "project":
+        for field in PROJECT_FIELDS:
+            value = record.get(field)
+            max_length = Project._meta.get_field(field).max_length
+            if max_length and value is not None and len(value) > max_length:
+                raise ValueError(f"Field '{field}' is longer than {max_length}")
+    elif kind == "message" and record["sender"] not in SENDERS:
+        raise ValueError(f"Unknown sender: {record['sender']!r}")
+
+
+def _validated_lines(lines):
+    """
+    Check every line of an export before anything is written.
+
+    Args:
+        lines: Iterable of NDJSON lines (str or bytes)
+
+    Returns:
+        A file positioned at the start of the validated records (one JSON
+        object per line, without the header)
+
+    Raises:
+        ValueError: If the input is not a valid project export
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+")
+    header = None
+    project = False
+    conversations = set()
+    try:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {number} is not valid JSON: {e}")
+
+            if header is None:
+                if (
+                    not isinstance(record, dict)
+                    or record.get("type") != "header"
+                    or record.get("format") != EXPORT_FORMAT
+                ):
+                    raise ValueError("Not a BoardBoost project export")
+                if record.get("version") != EXPORT_VERSION:
+                    raise ValueError(
+                        f"Unsupported export version {record.get('version')}"
+                    )
+                header = record
+                continue
+
+            try:
+                _check_record(record)
+            except ValueError as e:
+                raise ValueError(f"Line {number}: {e}")
+
+            kind = record["type"]
+            if kind == "project":
+                if project:
+                    raise ValueError("An export may contain only one project")
+                project = True
+            elif not project:
+                raise ValueError("The project record must come before any other record")
+            elif kind == "conversation":
+                conversations.add(record["id"])
+            elif record["conversation"] not in conversations:
+                raise ValueError(
+                    f"Line {number} refers to unknown conversation "
+                    f"{record['conversation']}"
+                )
+            spool.write(_line(record))
+
+        if not project:
+            raise ValueError("The export contains no project")
+    except BaseException:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool
+
+
+def _index_embeddings(project, batch_size):
+    """Add an imported project's embeddings to the owner's index."""
+    from .embedding_index import index_message_embeddings
+
+    embeddings = MessageEmbedding.objects.filter(
+        message__conversation__project=project
+    ).only("message_id", "embedding")
+    batch = []
+    for embedding in embeddings.iterator(chunk_size=batch_size):
+        batch.append(embedding)
+        if len(batch) >= batch_size:
+            index_message_embeddings(batch)
+            batch = []
+    if batch:
+        index_message_embeddings(batch)
+
+
+def import_project(lines, user, batch_size=None):
+    """
+    Create a project for ``user`` from lines produced by export_project.
+
+    Every record is checked before anything is written, then records are
+    written in batches with bulk_create inside one transaction, so a failed
+    import leaves nothing behind.
+
+    Args:
+        lines: Iterable of NDJSON lines (str or bytes)
+        user: The user who will own the imported project
+        batch_size: Records written per bulk_create
+
+    Returns:
+        The new Project
+
+    Raises:
+        ValueError: If the input is not a valid project export
+    """
+    importer = _Importer(user, batch_size or settings.PROJECT_TRANSFER_BATCH_SIZE)
+
+    with _validated_lines(lines) as records, transaction.atomic():
+        for line in records:
+            importer.add(json.loads(line))
+        importer.flush_messages()
+        importer.flush_summaries()
+
+    # bulk_create sends no signals, so add the embeddings to the owner's
+    # cross-project index once the import is committed
+    if settings.EMBEDDING_INDEX_ENABLED:
+        try:
+            _index_embeddings(importer.project, importer.batch_size)
+        except Exception as e:
+            # The import is committed; a rebuild picks these embeddings up
+            logger.error(
+                f"Error indexing embeddings of project {importer.project.id}: {e}"
+            )
+
+    # The timestamps were restored with update(), not on this instance
+    importer.project.refresh_from_db()
+    return importer.project
@@ -0,0 +1,63 @@
+import re
+
+from .models import Message
+
+# Built on first use by _get_markdown()
+_markdown = None
+
+_UNLABELLED_FENCE = re.compile(r"```(\w+)?\n([\s\S]*?)```")
+
+
+def _get_markdown():
+    global _markdown
+    if _markdown is None:
+        from markdown_it import MarkdownIt
+
+        # Same options as the markdown-it instance in main.js. Raw HTML in
+        # the source is escaped and unsafe link schemes are rejected, so the
+        # output can be inserted into the page as-is.
+        _markdown = MarkdownIt(
+            "js-default",
+            {"html": False, "breaks": True, "linkify": True, "typographer": True},
+        )
+    return _markdown
+
+
+def render_markdown(content):
+    """
+    Render message markdown to HTML the way the chat client does.
+
+    Args:
+        content: Markdown text
+
+    Returns:
+        HTML string
+    """
+    # Label bare code fences so highlight.js treats them as plain text
+    content = _UNLABELLED_FENCE.sub(
+        lambda m: f"```{m.group(1) or 'plaintext'}\n{m.group(2)}```", content
+    )
+    return _get_markdown().render(content)
+
+
+def fill_message_html(messages):
+    """
+    Render and store HTML for assistant messages that don't have it yet
+    (messages saved before rendering moved to the server).
+
+    Args:
+        messages: Iterable of Message objects; updated in place
+
+    Returns:
+        Number of messages rendered
+    """
+    missing = [
+        message
+        for message in messages
+        if message.sender == "assistant" and not message.content_html
+    ]
+    for message in missing:
+        message.content_html = render_markdown(message.content)
+    if missing:
+        Message.objects.bulk_update(missing, ["content_html"], batch_size=500)
+    return len(missing)
@@ -0,0 +1,219 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CachedResponse, Message
+
+logger = logging.getLogger(__name__)
+
+# Per-process candidate answers by (model, board type), least recently used first
+_candidate_sets = OrderedDict()
+_candidates_lock = threading.Lock()
+MAX_CANDIDATE_SETS = 32
+
+# Per-process hit metrics
+_metrics = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(name):
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+def get_cache_metrics():
+    """Return a snapshot of this process's response cache counters."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def is_cacheable(conversation):
+    """
+    Check whether a conversation's answer depends on nothing but the question
+    and the board type, i.e. it is safe to share with other users.
+
+    Args:
+        conversation: The conversation (with its project) being answered
+
+    Returns:
+        Boolean
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return False
+
+    project = conversation.project
+    if project.components_text or project.libraries_text or project.description:
+        return False
+
+    # Only the current question may exist; earlier history changes the answer
+    return Message.objects.filter(conversation=conversation).count() <= 1
+
+
+class _Candidates:
+    """
+    The newest stored answers of one (model, board type) as a normalized
+    embedding matrix, kept per process. Each lookup only reads the rows
+    stored since the previous one, so their embeddings are fetched and
+    decoded once rather than on every request.
+    """
+
+    def __init__(self, model, board_type):
+        import numpy as np
+
+        self.model = model
+        self.board_type = board_type
+        self.last_id = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.created_at = np.empty(0, dtype=np.float64)
+        self.matrix = None
+        self.lock = threading.Lock()
+
+    def refresh(self, cutoff):
+        """Add the rows stored since the last refresh; returns a snapshot."""
+        import numpy as np
+
+        limit = settings.RESPONSE_CACHE_MAX_CANDIDATES
+        with self.lock:
+            rows = list(
+                CachedResponse.objects.filter(
+                    model=self.model,
+                    board_type=self.board_type,
+                    id__gt=self.last_id,
+                    created_at__gte=cutoff,
+                )
+                .order_by("-id")
+                .values_list("id", "created_at", "embedding")[:limit]
+            )
+            if rows:
+                rows.reverse()
+                self.last_id = rows[-1][0]
+                self._append(rows, limit)
+            return self.ids, self.created_at, self.matrix
+
+    def _append(self, rows, limit):
+        import numpy as np
+
+        dim = len(rows[-1][2]) if self.matrix is None else self.matrix.shape[1]
+        # Answers embedded with another model can't be compared
+        rows = [row for row in rows if len(row[2]) == dim]
+        if not rows:
+            return
+        vectors = np.array([row[2] for row in rows], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        created_at = np.array([row[1].timestamp() for row in rows], dtype=np.float64)
+        if self.matrix is not None:
+            vectors = np.concatenate([self.matrix, vectors])
+            ids = np.concatenate([self.ids, ids])
+            created_at = np.concatenate([self.created_at, created_at])
+        self.matrix = vectors[-limit:]
+        self.ids = ids[-limit:]
+        self.created_at = created_at[-limit:]
+
+
+def _candidates(model, board_type):
+    key = (model, board_type)
+    with _candidates_lock:
+        candidates = _candidate_sets.get(key)
+        if candidates is None:
+            candidates = _candidate_sets[key] = _Candidates(model, board_type)
+            while len(_candidate_sets) > MAX_CANDIDATE_SETS:
+                _candidate_sets.popitem(last=False)
+        else:
+            _candidate_sets.move_to_end(key)
+    return candidates
+
+
+def _forget_candidates(model, board_type):
+    with _candidates_lock:
+        _candidate_sets.pop((model, board_type), None)
+
+
+def lookup_cached_response(query_embedding, model, board_type=""):
+    """
+    Find a stored answer to a near-identical question.
+
+    Args:
+        query_embedding: Embedding vector of the current question
+        model: Model name the answer must have been generated with
+        board_type: The project's board type
+
+    Returns:
+        CachedResponse or None
+    """
+    _count("lookups")
+    board_type = board_type or ""
+    cutoff = timezone.now() - timedelta(seconds=settings.RESPONSE_CACHE_TTL)
+    ids, created_at, matrix = _candidates(model, board_type).refresh(cutoff)
+    if matrix is None or matrix.shape[1] != len(query_embedding):
+        _count("misses")
+        return None
+
+    import numpy as np
+
+    # Cosine similarity against every unexpired candidate at once
+    query = np.asarray(query_embedding, dtype=np.float32)
+    scores = matrix @ (query / np.linalg.norm(query))
+    scores[created_at < cutoff.timestamp()] = -np.inf
+    best = int(np.argmax(scores))
+
+    if scores[best] < settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD:
+        _count("misses")
+        return None
+
+    cached_id = int(ids[best])
+    cached = CachedResponse.objects.filter(id=cached_id).first()
+    if cached is None or cached.created_at.timestamp() != created_at[best]:
+        # Deleted (or the table was restored) since it was read; start over
+        _forget_candidates(model, board_type)
+        _count("misses")
+        return None
+
+    CachedResponse.objects.filter(id=cached_id).update(
+        hit_count=F("hit_count") + 1, last_hit_at=timezone.now()
+    )
+    _count("hits")
+    logger.info(
+        f"Response cache hit (id={cached_id}, similarity={scores[best]:.4f}, model={model})"
+    )
+    return cached
+
+
+def store_cached_response(question, query_embedding, model, board_type, response):
+    """
+    Remember an answer so that near-identical questions can reuse it.
+
+    Returns:
+        The created CachedResponse
+    """
+    _count("stores")
+    return CachedResponse.objects.create(
+        model=model,
+        board_type=board_type or "",
+        question=question,
+        embedding=list(query_embedding),
+        response=response,
+    )
+
+
+def purge_expired_responses(dry_run=False):
+    """
+    Delete stored answers older than RESPONSE_CACHE_TTL.
+
+    Args:
+        dry_run: Only count the expired answers
+
+    Returns:
+        Number of expired answers
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.RESPONSE_CACHE_TTL)
+    expired = CachedResponse.objects.filter(created_at__lt=cutoff)
+    if dry_run:
+        return expired.count()
+    deleted, _ = expired.delete()
+    return deleted
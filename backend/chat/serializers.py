@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Project, Conversation, Message
 
@@ -40,15 +41,54 @@ class ProjectSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("History window size must be a number.")
 
 
+class ProjectListSerializer(serializers.ModelSerializer):
+    """Slim serializer for the project list in the sidebar"""
+
+    class Meta:
+        model = Project
+        fields = ["id", "name", "board_type", "board_fqbn", "created_at", "updated_at"]
+
+
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = ["id", "conversation", "sender", "content", "timestamp"]
+        fields = [
+            "id",
+            "conversation",
+            "sender",
+            "content",
+            "content_html",
+            "timestamp",
+        ]
+        read_only_fields = ["content_html"]
 
 
 class ConversationSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
+    """Serializer for a conversation with its most recent messages"""
+
+    messages = serializers.SerializerMethodField()
 
     class Meta:
         model = Conversation
         fields = ["id", "project", "created_at", "messages"]
+
+    def get_messages(self, conversation):
+        # Views prefetch the newest messages into latest_messages
+        messages = getattr(conversation, "latest_messages", None)
+        if messages is None:
+            messages = conversation.messages.order_by("-timestamp")[
+                : settings.CONVERSATION_MESSAGE_LIMIT
+            ]
+        # Oldest to newest
+        return MessageSerializer(reversed(list(messages)), many=True).data
+
+
+class ConversationListSerializer(serializers.ModelSerializer):
+    """Summary-only serializer for listing conversations"""
+
+    message_count = serializers.IntegerField(read_only=True)
+    last_message_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ["id", "project", "created_at", "message_count", "last_message_at"]
@@ -0,0 +1,33 @@
+import logging
+import shutil
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Conversation, MessageEmbedding
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=MessageEmbedding)
+def embedding_saved(sender, instance, created, **kwargs):
+    """Keep the user's cross-project index up to date"""
+    if not created or not settings.EMBEDDING_INDEX_ENABLED:
+        return
+    # Deferred: the embedding index pulls in numpy, which the app doesn't
+    # import at startup
+    from .embedding_index import index_message_embeddings
+
+    try:
+        index_message_embeddings([instance])
+    except Exception as e:
+        logger.error(f"Error updating embedding index: {e}")
+
+
+@receiver(post_delete, sender=Conversation)
+def conversation_deleted(sender, instance, **kwargs):
+    """Remove the conversation's embedding store"""
+    from .embedding_index import ConversationEmbeddingStore
+
+    shutil.rmtree(ConversationEmbeddingStore(instance.id).directory, ignore_errors=True)
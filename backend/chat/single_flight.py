@@ -0,0 +1,100 @@
+import logging
+import secrets
+import threading
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Waiters in this process, woken as soon as the owner finishes
+_local_events = {}
+_local_events_lock = threading.Lock()
+
+POLL_INTERVAL = 0.1
+
+
+def run_once(key, func, result_ttl, lock_timeout):
+    """
+    Run ``func`` once per key across all workers sharing the Django cache.
+
+    The first caller takes a lock with ``cache.add`` and runs ``func``; its
+    result is stored for ``result_ttl`` seconds (at least a few, so that
+    waiting callers can collect it). Concurrent callers with the
+    same key wait for that result instead of running ``func`` themselves,
+    and later callers within ``result_ttl`` get it straight away. If the
+    owner fails without a result, one waiter takes over.
+
+    Args:
+        key: Cache key identifying the operation
+        func: Callable returning a picklable result
+        result_ttl: Seconds a finished result is replayed
+        lock_timeout: Seconds before an abandoned lock expires; also the
+            longest a caller waits
+
+    Returns:
+        Tuple of (result, replayed)
+    """
+    lock_key = f"{key}:lock"
+    result_key = f"{key}:result"
+    deadline = time.monotonic() + lock_timeout
+
+    while True:
+        result = cache.get(result_key)
+        if result is not None:
+            return result, True
+
+        token = secrets.token_hex(8)
+        if cache.add(lock_key, token, lock_timeout):
+            return (
+                _run_as_owner(key, lock_key, result_key, token, func, result_ttl),
+                False,
+            )
+
+        if time.monotonic() >= deadline:
+            # The owner is stuck; don't make this request wait forever
+            logger.warning(f"Gave up waiting for in-flight request {key}")
+            return func(), False
+
+        _wait(key, lock_key, result_key, deadline)
+
+
+def get_result(key):
+    """
+    Return the stored result of a finished ``run_once`` call for ``key``.
+
+    Returns:
+        The result, or None if there is none (yet)
+    """
+    return cache.get(f"{key}:result")
+
+
+def _run_as_owner(key, lock_key, result_key, token, func, result_ttl):
+    with _local_events_lock:
+        event = _local_events.setdefault(key, threading.Event())
+    try:
+        result = func()
+        cache.set(result_key, result, max(result_ttl, 5))
+        return result
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+        with _local_events_lock:
+            _local_events.pop(key, None)
+        event.set()
+
+
+def _wait(key, lock_key, result_key, deadline):
+    """Block until the owner of ``key`` finishes or the deadline passes."""
+    with _local_events_lock:
+        event = _local_events.get(key)
+    if event is not None:
+        # The owner runs in this process
+        event.wait(max(deadline - time.monotonic(), 0))
+        return
+
+    # The owner runs in another process; poll the shared cache
+    while time.monotonic() < deadline:
+        if cache.get(result_key) is not None or cache.get(lock_key) is None:
+            return
+        time.sleep(POLL_INTERVAL)
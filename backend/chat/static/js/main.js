@@ -2,6 +2,9 @@
 let currentConversationId = null;
 let currentProjectId = null;
 let currentFile = null;
+let sendInFlight = false;
+// Idempotency key of the message being sent: { fingerprint, key }
+let pendingSend = null;
 
 // SVG icon for download functionality
 const DOWNLOAD_ICON = `
@@ -366,7 +369,24 @@ function addCodeButtons() {
 }
 
 // Helper function to add messages to the chat UI with markdown support
-function addMessage(content, sender) {
+// Highlight code blocks once they scroll into view, so loading a long
+// history doesn't highlight every block up front
+const codeHighlighter =
+  "IntersectionObserver" in window
+    ? new IntersectionObserver((entries, observer) => {
+        entries.forEach((entry) => {
+          if (entry.isIntersecting) {
+            observer.unobserve(entry.target);
+            if (window.hljs) window.hljs.highlightElement(entry.target);
+          }
+        });
+      })
+    : null;
+
+// options.html: HTML rendered by the server (skips client-side markdown)
+// options.scroll: set to false when adding many messages at once
+function addMessage(content, sender, options = {}) {
+  const { html = "", scroll = true } = options;
   const chatMessages = document.getElementById("chat-messages");
   if (!chatMessages) return;
 
@@ -383,8 +403,21 @@ function addMessage(content, sender) {
   const contentDiv = document.createElement("div");
   contentDiv.classList.add("message-content");
 
-  // If the sender is assistant, render markdown
-  if (sender === "assistant") {
+  if (sender === "assistant" && html) {
+    // Already rendered and sanitized by the server
+    contentDiv.innerHTML = html;
+
+    if (window.hljs) {
+      messageDiv.querySelectorAll("pre code").forEach((block) => {
+        if (codeHighlighter) {
+          codeHighlighter.observe(block);
+        } else {
+          window.hljs.highlightElement(block);
+        }
+      });
+    }
+  } else if (sender === "assistant") {
+    // If the sender is assistant, render markdown
     // Process code blocks (```code```) to ensure proper language detection
     let processedContent = content.replace(
       /```(\w+)?\n([\s\S]*?)```/g,
@@ -412,6 +445,8 @@ function addMessage(content, sender) {
   messageDiv.appendChild(contentDiv);
   chatMessages.appendChild(messageDiv);
 
+  if (!scroll) return;
+
   // For assistant messages, scroll to show the top of the message
   if (sender === "assistant") {
     // Wait for the DOM to update and animations to start
@@ -734,11 +769,16 @@ function loadProjectMessages(projectId) {
         // Set the conversation ID
         currentConversationId = data.conversation_id;
 
-        // Add all messages to the chat
+        // Add all messages to the chat, using the server-rendered HTML
         data.messages.forEach((message) => {
-          addMessage(message.content, message.sender);
+          addMessage(message.content, message.sender, {
+            html: message.content_html,
+            scroll: false,
+          });
         });
 
+        addCodeButtons();
+
         // Scroll to the bottom
         chatMessages.scrollTop = chatMessages.scrollHeight;
       } else {
@@ -881,6 +921,39 @@ function saveProject() {
     });
 }
 
+function newIdempotencyKey() {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+// One key per composed message: resubmitting the same message after a
+// failed request reuses it, so the server answers it only once and replays
+// that answer. A new message gets a new key.
+function idempotencyKeyFor(messageData) {
+  const fingerprint = `${messageData.project_id}:${messageData.content}`;
+  if (!pendingSend || pendingSend.fingerprint !== fingerprint) {
+    pendingSend = { fingerprint, key: newIdempotencyKey() };
+  }
+  return pendingSend.key;
+}
+
+// Forget the key once the server has answered for good; keep it after a
+// network error, a rate limit or a server error so a resubmit can reuse it
+function settleIdempotencyKey(response) {
+  if (response.status !== 429 && response.status < 500) {
+    pendingSend = null;
+  }
+}
+
+// Disable the send button while a message is being answered
+function setSendInFlight(inFlight) {
+  sendInFlight = inFlight;
+  const sendButton = document.getElementById("send-button");
+  if (sendButton) sendButton.disabled = inFlight;
+}
+
 // Function to send a message to the AI assistant
 function sendMessage() {
   const userInput = document.getElementById("user-input");
@@ -888,7 +961,8 @@ function sendMessage() {
 
   const message = userInput.value.trim();
 
-  if (!message && !currentFile) {
+  // Ignore double-clicks and repeated Enter presses
+  if (sendInFlight || (!message && !currentFile)) {
     return;
   }
 
@@ -937,15 +1011,18 @@ function sendMessage() {
   };
 
   // Send message to API
+  setSendInFlight(true);
   fetch("/api/send-message/", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
       "X-CSRFToken": getCookie("csrftoken"),
+      "Idempotency-Key": idempotencyKeyFor(messageData),
     },
     body: JSON.stringify(messageData),
   })
     .then((response) => {
+      settleIdempotencyKey(response);
       if (response.status === 403) {
         // Handle insufficient tokens
         hideTypingIndicator(); // Hide indicator on error
@@ -953,6 +1030,12 @@ function sendMessage() {
           throw new Error(data.error || "Insufficient tokens");
         });
       }
+      if (response.status === 429) {
+        // Rate limited or too many requests in flight
+        return response.json().then((data) => {
+          throw new Error(data.detail || "Too many requests. Please wait.");
+        });
+      }
       return response.json();
     })
     .then((data) => {
@@ -991,7 +1074,8 @@ function sendMessage() {
         error.message || "Sorry, there was an error processing your message.",
         "assistant"
       );
-    });
+    })
+    .finally(() => setSendInFlight(false));
 }
 
 // Sending messages with files
@@ -1060,16 +1144,19 @@ function sendMessageWithFile(message, fileContent, fileName) {
   };
 
   // Send message to API
+  setSendInFlight(true);
   fetch("/api/send-message/", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
       "X-CSRFToken": getCookie("csrftoken"),
+      "Idempotency-Key": idempotencyKeyFor(messageData),
     },
     body: JSON.stringify(messageData),
   })
     // Rest of function remains the same
     .then((response) => {
+      settleIdempotencyKey(response);
       if (response.status === 403) {
         // Handle insufficient tokens
         hideTypingIndicator(); // Hide indicator on error
@@ -1077,6 +1164,12 @@ function sendMessageWithFile(message, fileContent, fileName) {
           throw new Error(data.error || "Insufficient tokens");
         });
       }
+      if (response.status === 429) {
+        // Rate limited or too many requests in flight
+        return response.json().then((data) => {
+          throw new Error(data.detail || "Too many requests. Please wait.");
+        });
+      }
       return response.json();
     })
     .then((data) => {
@@ -1118,7 +1211,8 @@ function sendMessageWithFile(message, fileContent, fileName) {
         error.message || "Sorry, there was an error processing your message.",
         "assistant"
       );
-    });
+    })
+    .finally(() => setSendInFlight(false));
 }
 
 // Function to show the typing indicator
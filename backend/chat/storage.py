@@ -0,0 +1,47 @@
+from importlib import import_module
+
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+# Minifier (module, function) per file extension
+MINIFIERS = {
+    ".js": ("rjsmin", "jsmin"),
+    ".css": ("rcssmin", "cssmin"),
+}
+
+
+class MinifiedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's hashed, precompressed static files storage that also
+    minifies the app's JavaScript and CSS as collectstatic copies them in.
+
+    Files are minified before post-processing, so hashed names follow the
+    minified content and the .gz/.br variants are compressed from it (.br
+    needs the Brotli package). Only files under ``minify_prefixes`` are
+    minified; third-party assets (admin, rest_framework) ship as they are.
+    """
+
+    minify_prefixes = ("js/", "css/")
+
+    def save(self, name, content, max_length=None):
+        # collectstatic copies files in through save(); post-processing
+        # writes the hashed copies through _save() and is left alone
+        extension = "." + name.rsplit(".", 1)[-1]
+        if (
+            extension in MINIFIERS
+            and name.startswith(self.minify_prefixes)
+            and not name.endswith(".min" + extension)
+        ):
+            module_name, function_name = MINIFIERS[extension]
+            # Only collectstatic needs the minifiers
+            minify = getattr(import_module(module_name), function_name)
+            content = ContentFile(
+                minify(content.read().decode("utf-8")).encode("utf-8")
+            )
+        return super().save(name, content, max_length)
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Hash and compress the collected (minified) copies rather than the
+        # original source files
+        paths = {path: (self, path) for path in paths}
+        yield from super().post_process(paths, dry_run, **options)
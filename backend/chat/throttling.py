@@ -0,0 +1,145 @@
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from .cache import make_key
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a rate such as "20/min" into (requests, seconds).
+
+    Returns:
+        Tuple of (requests, seconds), or None if the rate is empty
+    """
+    if not rate:
+        return None
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Per-user token bucket kept in the Django cache.
+
+    A bucket holds up to ``requests`` tokens and refills continuously at
+    ``requests / seconds`` tokens per second, so short bursts are allowed
+    while the sustained rate stays bounded. Subclasses set ``scope``; the
+    rate comes from settings.THROTTLE_RATES[scope] and an empty rate
+    disables the throttle.
+
+    The read-modify-write is not atomic across workers, so with a shared
+    cache a few extra requests may slip through under contention.
+    """
+
+    scope = None
+
+    def __init__(self):
+        self.rate = parse_rate(settings.THROTTLE_RATES.get(self.scope))
+        self.retry_after = None
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return make_key("throttle", self.scope, ident)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        capacity, period = self.rate
+        refill_per_second = capacity / period
+        key = self.get_cache_key(request)
+        now = time.time()
+
+        tokens, updated_at = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+        if tokens < 1:
+            self.retry_after = (1 - tokens) / refill_per_second
+            cache.set(key, (tokens, now), period)
+            return False
+
+        cache.set(key, (tokens - 1, now), period)
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+def check_throttle(throttle_class, request):
+    """
+    Apply a throttle inside a view, for views that must do some work (such
+    as answering a retried request) before the request is throttled.
+
+    Raises:
+        Throttled: The request is over the rate limit
+    """
+    throttle = throttle_class()
+    if not throttle.allow_request(request, None):
+        raise Throttled(wait=throttle.wait())
+
+
+class SendMessageRateThrottle(TokenBucketThrottle):
+    scope = "send_message"
+
+
+class CompileRateThrottle(TokenBucketThrottle):
+    scope = "compile"
+
+
+def limit_concurrency(scope):
+    """
+    Decorator limiting how many requests of a user may run a view at once.
+
+    The limit comes from settings.CONCURRENCY_LIMITS[scope] (0 disables it).
+    Requests over the limit are rejected with 429 and a Retry-After of
+    settings.CONCURRENCY_RETRY_AFTER seconds. Counters live in the Django
+    cache and expire after settings.CONCURRENCY_SLOT_TIMEOUT seconds, so a
+    worker that dies mid-request can't block the user for good.
+
+    Apply it below ``@api_view`` so that the request is authenticated first.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limit = settings.CONCURRENCY_LIMITS.get(scope)
+            if not limit:
+                return view(request, *args, **kwargs)
+
+            key = make_key("in_flight", scope, request.user.pk)
+            cache.add(key, 0, settings.CONCURRENCY_SLOT_TIMEOUT)
+            try:
+                in_flight = cache.incr(key)
+            except ValueError:
+                # Expired between add() and incr()
+                cache.add(key, 1, settings.CONCURRENCY_SLOT_TIMEOUT)
+                in_flight = 1
+
+            try:
+                if in_flight > limit:
+                    raise Throttled(
+                        wait=settings.CONCURRENCY_RETRY_AFTER,
+                        detail="Too many requests in progress. Please wait for "
+                        "the previous one to finish.",
+                    )
+                return view(request, *args, **kwargs)
+            finally:
+                try:
+                    if cache.decr(key) < 0:
+                        cache.delete(key)
+                except ValueError:
+                    pass
+
+        return wrapper
+
+    return decorator
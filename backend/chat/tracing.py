@@ -0,0 +1,153 @@
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The trace of the request being handled in the current thread/task
+_current_trace = contextvars.ContextVar("chat_trace", default=None)
+
+# Per-process aggregates: span name -> [bucket counts..., count, sum]
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+class Trace:
+    """Collects the spans recorded while handling a single request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.started = time.perf_counter()
+
+    def add(self, name, duration):
+        self.spans.append((name, duration))
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+    def totals(self):
+        """Return {span name: (count, total seconds)} in first-seen order."""
+        totals = {}
+        for name, duration in self.spans:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + duration)
+        return totals
+
+
+def observe(name, duration):
+    """Record a duration in the per-process histogram for ``name``."""
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += duration
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block of code.
+
+    The duration is added to the current request's trace (if any) and to the
+    process-wide histogram exposed by ``render_prometheus``.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, duration)
+        observe(name, duration)
+
+
+def traced(name=None):
+    """Decorator that wraps every call of a function in a span."""
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def start_trace(name):
+    """Make a new Trace current for the duration of the block."""
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def server_timing_header(trace):
+    """Format a trace as a Server-Timing header value."""
+    entries = [
+        f'{name};dur={total * 1000:.1f};desc="x{count}"'
+        for name, (count, total) in trace.totals().items()
+    ]
+    entries.append(f"total;dur={trace.duration * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def log_trace(trace, **fields):
+    """Emit a trace as a single structured JSON log line."""
+    record = {
+        "trace": trace.name,
+        "duration_ms": round(trace.duration * 1000, 2),
+        "spans": {
+            name: {"count": count, "ms": round(total * 1000, 2)}
+            for name, (count, total) in trace.totals().items()
+        },
+    }
+    record.update(fields)
+    logger.info(json.dumps(record))
+
+
+def render_prometheus():
+    """Render the per-process span histograms in Prometheus text format."""
+    lines = [
+        "# HELP boardboost_span_duration_seconds Time spent in instrumented code.",
+        "# TYPE boardboost_span_duration_seconds histogram",
+    ]
+    with _histograms_lock:
+        snapshot = {name: list(values) for name, values in _histograms.items()}
+
+    for name in sorted(snapshot):
+        values = snapshot[name]
+        for bound, count in zip(BUCKETS, values):
+            lines.append(
+                f'boardboost_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'boardboost_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {values[-2]}'
+        )
+        lines.append(
+            f'boardboost_span_duration_seconds_sum{{span="{name}"}} {values[-1]:.6f}'
+        )
+        lines.append(
+            f'boardboost_span_duration_seconds_count{{span="{name}"}} {values[-2]}'
+        )
+    return "\n".join(lines) + "\n"
@@ -20,6 +20,8 @@ urlpatterns = [
         name="project_messages",
     ),
     path("beta-closed/", views.beta_closed, name="beta_closed"),
+    path("metrics/", views.metrics, name="metrics"),
+    path("readyz/", views.readyz, name="readyz"),
     path("api/compile-arduino/", views.compile_arduino_code, name="compile_arduino"),
     path("api/arduino-boards/", views.get_arduino_boards, name="arduino_boards"),
     path(
@@ -1,27 +1,58 @@
 from django.http import HttpResponse, JsonResponse
 from .arduino_cli_service import ArduinoCliService
 import base64
+import hashlib
+import logging
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
 from django.shortcuts import render, redirect
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    action,
+    api_view,
+    permission_classes,
+    throttle_classes,
+)
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .ai_service import generate_response
 from .models import Project, Conversation, Message, MessageEmbedding, UserProfile
 from .serializers import (
     ProjectSerializer,
+    ProjectListSerializer,
     ConversationSerializer,
+    ConversationListSerializer,
     MessageSerializer,
 )
 from .ai_service import generate_response, save_conversation_message
 import json
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
-from .arduino_create_agent_signature import sign_arduino_command
+from .cache import make_key
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import Count, F, Max, Prefetch
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .model_router import get_route_metrics
+from .project_transfer import export_project, import_project
+from .rendering import fill_message_html
+from .response_cache import get_cache_metrics
+from .single_flight import get_result, run_once
+from .throttling import (
+    CompileRateThrottle,
+    SendMessageRateThrottle,
+    check_throttle,
+    limit_concurrency,
+)
+from .tracing import render_prometheus, span
+
+logger = logging.getLogger(__name__)
 
 
 @api_view(["GET"])
@@ -66,6 +97,54 @@ class ProjectViewSet(viewsets.ModelViewSet):
         user = self.request.user
         return Project.objects.filter(user=user).order_by("-updated_at")
 
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ProjectListSerializer
+        return ProjectSerializer
+
+    def list(self, request, *args, **kwargs):
+        """
+        List the user's projects as a conditional response.
+
+        The ETag is derived from the number of projects and their newest
+        updated_at, so an unchanged list costs one aggregate query and is
+        answered with a 304. The serialized list is cached per user and
+        dropped whenever one of their projects is saved or deleted.
+        """
+        queryset = self.get_queryset()
+        state = queryset.aggregate(count=Count("id"), last_modified=Max("updated_at"))
+        last_modified = state["last_modified"]
+        version = last_modified.timestamp() if last_modified else 0
+        etag = quote_etag(f"{request.user.id}-{state['count']}-{version}")
+
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(version) if last_modified else None,
+        )
+        if not_modified is None:
+            cache_key = Project.list_cache_key(request.user.id)
+            cached = cache.get(cache_key)
+            if cached is not None and cached["etag"] == etag:
+                data = cached["data"]
+            else:
+                data = self.get_serializer(queryset, many=True).data
+                cache.set(
+                    cache_key,
+                    {"etag": etag, "data": data},
+                    settings.PROJECT_LIST_CACHE_TTL,
+                )
+            response = Response(data)
+        else:
+            response = not_modified
+
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(version)
+        # Let the browser keep the list but revalidate it on every load
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def create(self, request, *args, **kwargs):
         """
         Custom create method to ensure user is set
@@ -101,24 +180,127 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        """
+        Stream the project with its conversation history as NDJSON
+        """
+        project = self.get_object()
+        response = StreamingHttpResponse(
+            export_project(project), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="project-{project.id}.ndjson"'
+        )
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_file(self, request):
+        """
+        Create a project for the current user from an NDJSON export.
+        The request body is read line by line.
+        """
+        if request.stream is None:
+            return Response(
+                {"error": "Request body is empty"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            project = import_project(request.stream, request.user)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(project)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ConversationPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
 
 class ConversationViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for the current user's conversations.
+
+    Lists are paginated and summary-only; pass ?messages=N to include the
+    newest N messages of each conversation. A single conversation includes
+    its newest CONVERSATION_MESSAGE_LIMIT messages.
+    """
+
     queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ConversationPagination
+
+    def message_limit(self):
+        """Number of newest messages to include per conversation"""
+        limit = settings.CONVERSATION_MESSAGE_LIMIT
+        if self.action != "list":
+            return limit
+        try:
+            return max(min(int(self.request.query_params.get("messages", 0)), limit), 0)
+        except ValueError:
+            return 0
+
+    def get_queryset(self):
+        queryset = Conversation.objects.filter(
+            project__user=self.request.user
+        ).order_by("-created_at")
+
+        if self.action == "list":
+            queryset = queryset.annotate(
+                message_count=Count("messages"),
+                last_message_at=Max("messages__timestamp"),
+            )
+
+        limit = self.message_limit()
+        if limit:
+            # One query for the newest messages of every conversation on the page
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "messages",
+                    queryset=Message.objects.order_by("-timestamp")[:limit],
+                    to_attr="latest_messages",
+                )
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "list" and not self.message_limit():
+            return ConversationListSerializer
+        return ConversationSerializer
+
+    def check_project(self, serializer):
+        project = serializer.validated_data.get("project")
+        if project is not None and project.user_id != self.request.user.id:
+            raise ValidationError({"project": "Project not found."})
+
+    def perform_create(self, serializer):
+        self.check_project(serializer)
+        serializer.save()
+
+    def perform_update(self, serializer):
+        self.check_project(serializer)
+        serializer.save()
 
 
 ### SEND MESSAGE #######################################
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def send_message(request):
-    """Send a message - requires login and token availability"""
+    """
+    Send a message - requires login and token availability.
+
+    Duplicate submissions are coalesced: a request with the same
+    Idempotency-Key header (or, without one, the same content for the same
+    project) as one in flight or recently finished returns that request's
+    result instead of generating and billing a second response. Stored
+    results are returned before rate limiting, so a client retrying a
+    request isn't throttled. A key reused with a different project or
+    content is rejected with 422.
+    """
     if request.method == "POST":
-        # Check if user has tokens remaining
-        profile = request.user.userprofile
-
-        # Reset tokens if needed
-        profile.reset_tokens_if_needed()
-
         # Extract data from request
         content = request.data.get("content")
         project_id = request.data.get("project_id")
@@ -130,72 +312,142 @@ def send_message(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Get or create project
-        if not project_id:
-            # Create a default project if none specified
-            project = Project.objects.create(name="Default Project", user=request.user)
-            project_id = project.id
+        # What the request asks for; a reused key must ask for the same
+        fingerprint = hashlib.sha256(f"{project_id}:{content}".encode()).hexdigest()
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key:
+            digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+            result_ttl = settings.SEND_MESSAGE_IDEMPOTENCY_TTL
         else:
-            try:
-                project = Project.objects.get(id=project_id)
-            except Project.DoesNotExist:
-                return Response(
-                    {"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND
-                )
+            digest = fingerprint
+            result_ttl = settings.SEND_MESSAGE_DEDUP_WINDOW
+        key = make_key("send_message", request.user.id, digest)
 
-        # Get or create the SINGLE conversation for this project
-        conversation, created = Conversation.objects.get_or_create(project=project)
+        result = get_result(key)
+        if result is not None:
+            return replay_response(result, fingerprint)
+
+        check_throttle(SendMessageRateThrottle, request)
+        result, replayed = send_message_once(
+            request, key, fingerprint, content, project_id, result_ttl
+        )
+        if replayed:
+            return replay_response(result, fingerprint)
+        _, data, status_code = result
+        return Response(data, status=status_code)
 
-        # Estimate token count based on message length (approximately 4 chars per token)
-        estimated_message_tokens = len(content) // 4 + 1
 
-        # Check if user might exceed token limit
-        if profile.tokens_remaining < estimated_message_tokens:
-            return Response(
-                {
-                    "error": "You have insufficient tokens remaining. Tokens will reset at midnight."
-                },
-                status=status.HTTP_403_FORBIDDEN,
-            )
+@limit_concurrency("send_message")
+def send_message_once(request, key, fingerprint, content, project_id, result_ttl):
+    """
+    Run process_message once per key.
+
+    Returns:
+        Tuple of ((fingerprint, response data, status code), replayed)
+    """
+    return run_once(
+        key,
+        lambda: (fingerprint, *process_message(request, content, project_id)),
+        result_ttl=result_ttl,
+        lock_timeout=settings.SEND_MESSAGE_LOCK_TIMEOUT,
+    )
 
-        # Save user message
-        user_message = save_conversation_message(conversation, "user", content)
-        # user_message = Message.objects.create(
-        #     conversation=conversation, sender="user", content=content
-        # )
 
-        # Generate response with token usage information
-        assistant_response, tokens_used = generate_response(
-            content, conversation.id, request.user
+def replay_response(result, fingerprint):
+    """Return a stored send_message result, if it was for the same request"""
+    stored_fingerprint, data, status_code = result
+    if stored_fingerprint != fingerprint:
+        return Response(
+            {"error": "Idempotency-Key was already used for a different message"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
         )
+    response = Response(data, status=status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
 
-        # Update user's token balance
-        profile.tokens_remaining -= tokens_used
-        if profile.tokens_remaining < 0:
-            profile.tokens_remaining = 0
-        profile.save()
 
-        # Save assistant message
-        assistant_message = save_conversation_message(
-            conversation, "assistant", assistant_response
-        )
+def process_message(request, content, project_id):
+    """
+    Save the user's message, generate and save the reply and bill the tokens.
+
+    Returns:
+        Tuple of (response data, status code)
+    """
+    # Check if user has tokens remaining
+    profile = request.user.userprofile
 
-        # assistant_message = Message.objects.create(
-        #     conversation=conversation, sender="assistant", content=assistant_response
-        # )
+    # Reset tokens if needed
+    with span("reset_tokens"):
+        profile.reset_tokens_if_needed()
 
-        # Add token usage information to the response
-        return Response(
+    # Get or create project
+    if not project_id:
+        # Create a default project if none specified
+        project = Project.objects.create(name="Default Project", user=request.user)
+        project_id = project.id
+    else:
+        try:
+            project = Project.objects.get(id=project_id)
+        except Project.DoesNotExist:
+            return {"error": "Project not found"}, status.HTTP_404_NOT_FOUND
+
+    # Get or create the SINGLE conversation for this project
+    conversation, created = Conversation.objects.get_or_create(project=project)
+
+    # Estimate token count based on message length (approximately 4 chars per token)
+    estimated_message_tokens = len(content) // 4 + 1
+
+    # Check if user might exceed token limit
+    if profile.tokens_remaining < estimated_message_tokens:
+        return (
             {
-                "conversation_id": conversation.id,
-                "project_id": conversation.project.id,
-                "user_message": MessageSerializer(user_message).data,
-                "assistant_message": MessageSerializer(assistant_message).data,
-                "tokens_used": tokens_used,
-                "tokens_remaining": profile.tokens_remaining,
-            }
+                "error": "You have insufficient tokens remaining. Tokens will reset at midnight."
+            },
+            status.HTTP_403_FORBIDDEN,
         )
 
+    # Save user message
+    user_message = save_conversation_message(conversation, "user", content)
+    # user_message = Message.objects.create(
+    #     conversation=conversation, sender="user", content=content
+    # )
+
+    # Generate response with token usage information
+    assistant_response, tokens_used, route = generate_response(
+        content, conversation.id, request.user
+    )
+
+    # Update user's token balance in the database, so that concurrent replies
+    # for the same user (other threads or workers) don't overwrite each
+    # other's debit
+    with span("db_write"):
+        UserProfile.objects.filter(pk=profile.pk).update(
+            tokens_remaining=Greatest(F("tokens_remaining") - tokens_used, 0)
+        )
+        profile.refresh_from_db(fields=["tokens_remaining"])
+
+    # Save assistant message
+    assistant_message = save_conversation_message(
+        conversation, "assistant", assistant_response, route=route
+    )
+
+    # assistant_message = Message.objects.create(
+    #     conversation=conversation, sender="assistant", content=assistant_response
+    # )
+
+    # Add token usage information to the response
+    return (
+        {
+            "conversation_id": conversation.id,
+            "project_id": conversation.project.id,
+            "user_message": MessageSerializer(user_message).data,
+            "assistant_message": MessageSerializer(assistant_message).data,
+            "tokens_used": tokens_used,
+            "tokens_remaining": profile.tokens_remaining,
+        },
+        status.HTTP_200_OK,
+    )
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -208,9 +460,11 @@ def project_messages(request, project_id):
         conversation, created = Conversation.objects.get_or_create(project=project)
 
         # Get all messages for this conversation
-        messages = Message.objects.filter(conversation=conversation).order_by(
-            "timestamp"
+        messages = list(
+            Message.objects.filter(conversation=conversation).order_by("timestamp")
         )
+        # Older assistant messages are rendered once, then served as stored
+        fill_message_html(messages)
 
         return Response(
             {
@@ -222,6 +476,74 @@ def project_messages(request, project_id):
         return Response({"error": "Project not found"}, status=404)
 
 
+## Metrics ##############################################
+def metrics(request):
+    """
+    Prometheus-style metrics for the worker process that serves the request.
+
+    Requires the METRICS_TOKEN bearer token when one is configured,
+    otherwise a staff login.
+    """
+    if settings.METRICS_TOKEN:
+        authorized = (
+            request.headers.get("Authorization") == f"Bearer {settings.METRICS_TOKEN}"
+        )
+    else:
+        authorized = request.user.is_staff
+    if not authorized:
+        return HttpResponse(status=403)
+
+    lines = [
+        render_prometheus(),
+        "# HELP boardboost_response_cache_total Response cache events.",
+        "# TYPE boardboost_response_cache_total counter",
+    ]
+    for event, count in get_cache_metrics().items():
+        lines.append(f'boardboost_response_cache_total{{event="{event}"}} {count}')
+
+    lines += [
+        "# HELP boardboost_model_route_total Chat completions by route and model.",
+        "# TYPE boardboost_model_route_total counter",
+    ]
+    for (route, model), count in get_route_metrics().items():
+        lines.append(
+            f'boardboost_model_route_total{{route="{route}",model="{model}"}} {count}'
+        )
+
+    return HttpResponse(
+        "\n".join(lines) + "\n", content_type="text/plain; version=0.0.4"
+    )
+
+
+## Readiness ############################################
+def readyz(request):
+    """
+    Readiness probe for the load balancer.
+
+    Returns 200 once this worker can reach the database and arduino-cli has
+    been warmed up (when ARDUINO_CLI_WARM_UP is set), 503 (with the failing
+    checks) until then.
+    """
+    checks = {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        checks["database"] = "ok"
+    except DatabaseError as e:
+        logger.error(f"Readiness database check failed: {e}")
+        checks["database"] = "error"
+
+    if settings.ARDUINO_CLI_WARM_UP:
+        ArduinoCliService.start_warm_up()
+        checks["arduino_cli"] = ArduinoCliService.warm_up_state
+
+    ready = all(state == "ok" for state in checks.values())
+    return JsonResponse(
+        {"status": "ready" if ready else "not ready", "checks": checks},
+        status=200 if ready else 503,
+    )
+
+
 ## Login ################################################
 @login_required
 def index(request):
@@ -267,6 +589,8 @@ def user_settings(request):
 # Compilation view
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([CompileRateThrottle])
+@limit_concurrency("compile")
 def compile_arduino_code(request):
     """Compile Arduino code and return the binary file"""
     try:
@@ -343,7 +667,9 @@ def sign_arduino_command_view(request):
         if not commandline:
             return JsonResponse({"error": "Commandline is required"}, status=400)
 
-        # Sign the commandline
+        # Sign the commandline (cryptography is only loaded when needed)
+        from .arduino_create_agent_signature import sign_arduino_command
+
         signature = sign_arduino_command(commandline)
 
         # Return the signature
@@ -0,0 +1,104 @@
+"""
+Gunicorn configuration (run from backend/):
+
+    gunicorn -c gunicorn.conf.py
+
+Chat requests spend most of their time waiting on the OpenAI API and
+compiles on arduino-cli, so the default worker class is gthread: each
+worker process serves GUNICORN_THREADS requests at once and one slow call
+no longer blocks the site. Set GUNICORN_WORKER_CLASS to
+uvicorn.workers.UvicornWorker (pip install uvicorn) to serve the ASGI
+application instead.
+
+Environment variables:
+
+  GUNICORN_BIND                address to listen on (default 0.0.0.0:8000)
+  GUNICORN_WORKER_CLASS        worker class (default gthread)
+  GUNICORN_WORKERS             worker processes (default 2 * CPUs + 1,
+                               capped at GUNICORN_MAX_WORKERS)
+  GUNICORN_MAX_WORKERS         cap for the default worker count (default 8)
+  GUNICORN_THREADS             threads per gthread worker (default 4)
+  GUNICORN_TIMEOUT             seconds before a silent worker is restarted
+                               (default 120)
+  GUNICORN_GRACEFUL_TIMEOUT    seconds workers get to finish on restart
+                               (default 30)
+  GUNICORN_KEEPALIVE           keep-alive seconds (default 5)
+  GUNICORN_MAX_REQUESTS        requests before a worker is recycled, to
+                               contain memory growth (default 1000, 0 never)
+  GUNICORN_MAX_REQUESTS_JITTER random extra requests so workers don't all
+                               restart at once (default 100)
+  GUNICORN_PRELOAD             import the app before forking so workers
+                               share its memory (default true)
+  GUNICORN_LOG_LEVEL           log level (default info)
+  GUNICORN_ACCESS_LOG          access log target, e.g. "-" (default off;
+                               requests are already logged by tracing)
+"""
+
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def _cpu_count():
+    # Respect the CPUs the container is allowed to use
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+if "uvicorn" in worker_class.lower():
+    wsgi_app = "boardboost_project.asgi:application"
+else:
+    wsgi_app = "boardboost_project.wsgi:application"
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = _env_int(
+    "GUNICORN_WORKERS",
+    min(2 * _cpu_count() + 1, _env_int("GUNICORN_MAX_WORKERS", 8)),
+)
+threads = _env_int("GUNICORN_THREADS", 4) if worker_class == "gthread" else 1
+
+timeout = _env_int("GUNICORN_TIMEOUT", 120)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+preload_app = _env_bool("GUNICORN_PRELOAD", True)
+
+# Heartbeat files on a container's overlay filesystem can stall workers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # With preload_app the master imported Django; make sure no database
+    # connection it may have opened is shared with the forked workers
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    # Warm arduino-cli up before the first compile; /readyz/ reports 503
+    # until it is done
+    from django.conf import settings
+
+    from chat.arduino_cli_service import ArduinoCliService
+
+    if settings.ARDUINO_CLI_WARM_UP:
+        ArduinoCliService.start_warm_up()
@@ -0,0 +1,14 @@
+#!/bin/sh
+# One-shot release step, run once per deploy before the web workers start
+# (the "release" service in docker-compose.yml, a pre-deploy job on App
+# Platform). Static files are collected when the image is built.
+set -e
+
+python manage.py migrate --noinput
+
+# Publish the collected static files to the volume nginx serves from.
+# Files are hashed, so older versions are kept for clients still on the
+# previous release.
+if [ -n "$STATIC_PUBLISH_DIR" ]; then
+  cp -a staticfiles/. "$STATIC_PUBLISH_DIR"/
+fi
@@ -0,0 +1,143 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+import django_setup  # noqa: F401
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chat.embedding_index import UserEmbeddingIndex
+from chat.models import (
+    Conversation,
+    ConversationSummary,
+    Message,
+    MessageEmbedding,
+    Project,
+)
+
+
+class TestApplyRetention(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="x")
+        project = Project.objects.create(
+            user=self.user, name="Old project", history_window_size=3
+        )
+        self.conversation = Conversation.objects.create(project=project)
+        self.messages = [
+            Message.objects.create(
+                conversation=self.conversation, sender="user", content=f"message {i}"
+            )
+            for i in range(8)
+        ]
+        MessageEmbedding.objects.create(message=self.messages[0], embedding=[1.0])
+        self.age(self.messages, days=100)
+
+    def age(self, messages, days):
+        Message.objects.filter(id__in=[m.id for m in messages]).update(
+            timestamp=timezone.now() - timedelta(days=days)
+        )
+
+    def summarize_through(self, message, **fields):
+        return ConversationSummary.objects.create(
+            conversation=self.conversation,
+            content="Summary",
+            message_count=8,
+            last_message_id=message.id if message else None,
+            **fields,
+        )
+
+    def apply_retention(self, **options):
+        options.setdefault("days", 30)
+        options.setdefault("archive_dir", "")
+        call_command("apply_retention", stdout=io.StringIO(), **options)
+
+    def remaining(self):
+        return list(
+            Message.objects.filter(conversation=self.conversation)
+            .order_by("id")
+            .values_list("content", flat=True)
+        )
+
+    def test_keeps_messages_without_a_summary(self):
+        self.apply_retention()
+        self.assertEqual(len(self.remaining()), 8)
+
+    def test_prunes_old_messages_covered_by_the_summary(self):
+        self.summarize_through(self.messages[2])
+        self.apply_retention()
+        self.assertEqual(self.remaining(), [f"message {i}" for i in range(3, 8)])
+        # Embeddings go with their messages
+        self.assertFalse(MessageEmbedding.objects.exists())
+
+    def test_pruned_embeddings_leave_the_user_index(self):
+        self.enterContext(override_settings(EMBEDDING_INDEX_DIR=tempfile.mkdtemp()))
+        Message.objects.filter(id=self.messages[0].id).update(sender="assistant")
+        index = UserEmbeddingIndex(self.user.id)
+        index.ensure_built()
+        self.assertEqual(len(index), 1)
+
+        self.summarize_through(self.messages[2])
+        self.apply_retention()
+        # Dropped, then rebuilt from the remaining rows on next use
+        self.assertIsNone(index._meta())
+        index.ensure_built()
+        self.assertEqual(len(index), 0)
+
+    def test_keeps_the_history_window(self):
+        # Every message is summarized, but the last three are the window
+        self.summarize_through(self.messages[-1])
+        self.apply_retention()
+        self.assertEqual(self.remaining(), [f"message {i}" for i in range(5, 8)])
+
+    def test_keeps_messages_newer_than_the_cutoff(self):
+        self.age(self.messages[1:], days=1)
+        self.summarize_through(self.messages[2])
+        self.apply_retention()
+        self.assertEqual(self.remaining(), [f"message {i}" for i in range(1, 8)])
+
+    def test_legacy_summary_covers_messages_up_to_its_creation(self):
+        summary = self.summarize_through(None)
+        ConversationSummary.objects.filter(id=summary.id).update(
+            created_at=timezone.now() - timedelta(days=99)
+        )
+        self.age(self.messages[4:], days=98)
+        self.apply_retention()
+        self.assertEqual(self.remaining(), [f"message {i}" for i in range(4, 8)])
+
+    def test_zero_days_keeps_all_messages(self):
+        self.summarize_through(self.messages[-1])
+        self.apply_retention(days=0)
+        self.assertEqual(len(self.remaining()), 8)
+
+    def test_dry_run_changes_nothing(self):
+        self.summarize_through(self.messages[2])
+        self.apply_retention(dry_run=True)
+        self.assertEqual(len(self.remaining()), 8)
+        self.assertTrue(MessageEmbedding.objects.exists())
+
+    def test_archives_pruned_messages(self):
+        self.summarize_through(self.messages[2])
+        with tempfile.TemporaryDirectory() as archive_dir:
+            self.apply_retention(archive_dir=archive_dir)
+            self.assertEqual(len(os.listdir(archive_dir)), 1)
+
+    def test_keeps_only_the_latest_summaries(self):
+        for message in self.messages[:4]:
+            self.summarize_through(message)
+        self.apply_retention(keep_summaries=2)
+        self.assertEqual(
+            list(
+                ConversationSummary.objects.order_by("id").values_list(
+                    "last_message_id", flat=True
+                )
+            ),
+            [self.messages[2].id, self.messages[3].id],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import types
+import unittest
+
+import django_setup  # noqa: F401
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from chat import ai_service
+from chat.models import Conversation, ConversationSummary, Message, Project
+
+
+class FakeClient:
+    """Records the summary prompts instead of calling OpenAI."""
+
+    def __init__(self):
+        self.prompts = []
+        self.chat = types.SimpleNamespace(
+            completions=types.SimpleNamespace(create=self.create)
+        )
+
+    def create(self, model, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        message = types.SimpleNamespace(content=f"summary {len(self.prompts)}")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+class TestConversationSummary(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="x")
+        project = Project.objects.create(user=self.user, name="Project")
+        self.conversation = Conversation.objects.create(project=project)
+        self.openai = FakeClient()
+        self.original_client = ai_service.client
+        ai_service.client = self.openai
+
+    def tearDown(self):
+        ai_service.client = self.original_client
+
+    def add_messages(self, count, length=10):
+        start = Message.objects.filter(conversation=self.conversation).count()
+        return [
+            Message.objects.create(
+                conversation=self.conversation,
+                sender="user",
+                content=f"{start + i:03d}".ljust(length, "x"),
+            )
+            for i in range(count)
+        ]
+
+    def summarize(self, **kwargs):
+        return ai_service.generate_conversation_summary(
+            self.conversation.id, self.user, **kwargs
+        )
+
+    def test_first_summary_covers_every_message(self):
+        messages = self.add_messages(4)
+        summary = self.summarize()
+
+        self.assertEqual(summary.last_message_id, messages[-1].id)
+        self.assertEqual(summary.message_count, 4)
+        self.assertTrue(self.openai.prompts[0].startswith("Conversation:"))
+
+    def test_waits_for_enough_new_messages(self):
+        self.add_messages(4)
+        first = self.summarize()
+        self.add_messages(2)
+
+        self.assertEqual(self.summarize(message_threshold=3), first)
+        self.assertEqual(len(self.openai.prompts), 1)
+
+    def test_next_summary_only_reads_new_messages(self):
+        old = self.add_messages(4)
+        self.summarize()
+        new = self.add_messages(3)
+        summary = self.summarize(message_threshold=3)
+
+        prompt = self.openai.prompts[1]
+        self.assertTrue(prompt.startswith("Previous summary: summary 1"))
+        self.assertNotIn(old[-1].content, prompt)
+        self.assertIn(new[0].content, prompt)
+        self.assertEqual(summary.last_message_id, new[-1].id)
+        self.assertEqual(summary.message_count, 7)
+
+    @override_settings(SUMMARY_INPUT_TOKEN_BUDGET=30)
+    def test_stops_at_the_token_budget_and_resumes_later(self):
+        # Each message line costs about 6 tokens
+        messages = self.add_messages(8, length=16)
+        first = self.summarize()
+
+        covered = first.message_count
+        self.assertLess(covered, 8)
+        self.assertEqual(first.last_message_id, messages[covered - 1].id)
+        self.assertNotIn(messages[covered].content, self.openai.prompts[0])
+        self.assertLessEqual(
+            ai_service.estimate_token_count(self.openai.prompts[0]), 30
+        )
+
+        # The next summary picks up at the first message left out
+        second = self.summarize(message_threshold=1)
+        self.assertIn(messages[covered].content, self.openai.prompts[1])
+        self.assertNotIn(messages[covered - 1].content, self.openai.prompts[1])
+        self.assertGreater(second.message_count, covered)
+        self.assertEqual(second.last_message_id, messages[second.message_count - 1].id)
+
+    @override_settings(SUMMARY_INPUT_TOKEN_BUDGET=10)
+    def test_truncates_a_single_oversized_message(self):
+        message = self.add_messages(1, length=400)[0]
+        summary = self.summarize()
+
+        self.assertEqual(summary.last_message_id, message.id)
+        self.assertLess(len(self.openai.prompts[0]), 100)
+
+    def test_keeps_only_the_latest_summaries(self):
+        for _ in range(4):
+            self.add_messages(2)
+            self.summarize(message_threshold=1)
+        self.assertEqual(
+            ConversationSummary.objects.filter(conversation=self.conversation).count(),
+            2,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
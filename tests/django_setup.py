@@ -0,0 +1,47 @@
+"""
+Configure Django for the tests against a throwaway test database.
+
+Import this module before anything from the backend:
+
+    import django_setup  # noqa: F401
+"""
+
+import atexit
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"
+)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "boardboost_project.settings")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("DJANGO_SECRET_KEY", "test")
+os.environ.setdefault("TRACING_ENABLED", "False")
+# Tests must not call OpenAI or touch a shared cache or the real index files
+os.environ.setdefault("EMBEDDING_INDEX_ENABLED", "False")
+os.environ["EMBEDDING_INDEX_DIR"] = tempfile.mkdtemp(prefix="embedding-index-")
+os.environ["CACHE_URL"] = "locmemcache://"
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+setup_test_environment()
+_database_name = connection.settings_dict["NAME"]
+connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+@atexit.register
+def _teardown():
+    connection.creation.destroy_test_db(_database_name, verbosity=0)
+    teardown_test_environment()
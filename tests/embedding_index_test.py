@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+
+import django_setup  # noqa: F401
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from chat.ai_service import find_cross_project_messages
+from chat.embedding_index import UserEmbeddingIndex
+from chat.models import Conversation, Message, MessageEmbedding, Project
+
+
+@override_settings(CROSS_PROJECT_MIN_SIMILARITY=0.5)
+class TestUserEmbeddingIndex(TestCase):
+    def setUp(self):
+        self.enterContext(override_settings(EMBEDDING_INDEX_DIR=tempfile.mkdtemp()))
+        self.user = User.objects.create_user("owner", password="x")
+        self.other_project = Project.objects.create(user=self.user, name="Other")
+        self.current_project = Project.objects.create(user=self.user, name="Current")
+
+    def add_answer(self, project, embedding, content="answer"):
+        conversation = Conversation.objects.create(project=project)
+        message = Message.objects.create(
+            conversation=conversation, sender="assistant", content=content
+        )
+        MessageEmbedding.objects.create(message=message, embedding=embedding)
+        return message
+
+    def search(self, user, embedding):
+        return find_cross_project_messages(
+            user, embedding, exclude_project_id=self.current_project.id
+        )
+
+    def test_missing_index_is_built_from_the_database(self):
+        # Written while indexing was off, e.g. by another instance
+        with override_settings(EMBEDDING_INDEX_ENABLED=False):
+            message = self.add_answer(self.other_project, [1.0, 0.0])
+
+        self.assertEqual(self.search(self.user, [1.0, 0.0]), [message])
+        self.assertEqual(len(UserEmbeddingIndex(self.user.id)), 1)
+
+    @override_settings(EMBEDDING_INDEX_ENABLED=True)
+    def test_first_write_builds_the_whole_index(self):
+        with override_settings(EMBEDDING_INDEX_ENABLED=False):
+            self.add_answer(self.other_project, [1.0, 0.0])
+        self.add_answer(self.other_project, [0.0, 1.0])
+
+        self.assertEqual(len(UserEmbeddingIndex(self.user.id)), 2)
+
+    @override_settings(EMBEDDING_INDEX_ENABLED=True)
+    def test_never_returns_another_users_messages(self):
+        stranger = User.objects.create_user("stranger", password="x")
+        project = Project.objects.create(user=stranger, name="Theirs")
+        theirs = self.add_answer(project, [1.0, 0.0], content="secret")
+        self.add_answer(self.other_project, [0.0, 1.0])
+
+        # A stale index file that lists the stranger's message
+        UserEmbeddingIndex(self.user.id).add(
+            [theirs.id], [self.other_project.id], [[1.0, 0.0]]
+        )
+        self.assertEqual(self.search(self.user, [1.0, 0.0]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
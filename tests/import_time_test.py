@@ -0,0 +1,83 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+BACKEND_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"
+)
+
+# What a worker imports before serving its first request
+BOOT_SCRIPT = (
+    "import django; django.setup(); "
+    "import boardboost_project.urls, boardboost_project.wsgi"
+)
+
+# Heavy packages that must only be imported on first use
+LAZY_MODULES = ["openai", "numpy", "cryptography", "markdown_it"]
+
+# Total import time budget in milliseconds (override on slow machines)
+BUDGET_MS = int(os.environ.get("IMPORT_TIME_BUDGET_MS", 600))
+
+IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)")
+
+
+def measure_boot_imports():
+    """
+    Run the boot imports in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        Tuple of (set of imported module names, total milliseconds)
+    """
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE="boardboost_project.settings",
+        OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "test"),
+        DJANGO_SECRET_KEY=os.environ.get("DJANGO_SECRET_KEY", "test"),
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT_SCRIPT],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = set()
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = match.groups()
+        modules.add(name)
+        if len(indent) == 1:
+            # Top-level import; nested ones are included in its cumulative time
+            total_us += int(cumulative)
+    return modules, total_us / 1000
+
+
+class TestImportTime(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.modules, cls.total_ms = measure_boot_imports()
+
+    def test_heavy_modules_are_lazy(self):
+        for module in LAZY_MODULES:
+            with self.subTest(module=module):
+                self.assertFalse(
+                    module in self.modules, f"{module} is imported at boot"
+                )
+
+    def test_boot_import_time_within_budget(self):
+        self.assertLess(
+            self.total_ms,
+            BUDGET_MS,
+            f"Boot imports took {self.total_ms:.0f} ms (budget {BUDGET_MS} ms)",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
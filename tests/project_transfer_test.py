@@ -0,0 +1,153 @@
+import json
+import tempfile
+import unittest
+
+import django_setup  # noqa: F401
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from chat.models import (
+    Conversation,
+    ConversationSummary,
+    Message,
+    MessageEmbedding,
+    Project,
+)
+from chat.project_transfer import export_project, import_project
+
+
+class TestProjectTransfer(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="x")
+        self.recipient = User.objects.create_user("recipient", password="x")
+        self.project = Project.objects.create(
+            user=self.owner,
+            name="Weather station",
+            board_type="uno",
+            board_fqbn="arduino:avr:uno",
+            components_text="DHT22",
+            libraries_text="DHT sensor library",
+            description="Logs humidity",
+            history_window_size=4,
+            query_model="gpt-4o",
+        )
+        self.conversation = Conversation.objects.create(project=self.project)
+        self.messages = [
+            Message.objects.create(
+                conversation=self.conversation,
+                sender="user" if i % 2 == 0 else "assistant",
+                content=f"message {i}",
+            )
+            for i in range(6)
+        ]
+        MessageEmbedding.objects.create(
+            message=self.messages[1], embedding=[0.1, 0.2, 0.3]
+        )
+        ConversationSummary.objects.create(
+            conversation=self.conversation,
+            content="Summary of the first four messages",
+            message_count=4,
+            last_message_id=self.messages[3].id,
+        )
+
+    def round_trip(self, **export_options):
+        lines = list(export_project(self.project, chunk_size=2, **export_options))
+        return import_project(lines, self.recipient, batch_size=2)
+
+    def test_round_trip_copies_the_project(self):
+        imported = self.round_trip()
+
+        self.assertNotEqual(imported.id, self.project.id)
+        self.assertEqual(imported.user, self.recipient)
+        for field in ["name", "board_fqbn", "components_text", "query_model"]:
+            self.assertEqual(getattr(imported, field), getattr(self.project, field))
+        self.assertEqual(imported.created_at, self.project.created_at)
+
+        conversation = Conversation.objects.get(project=imported)
+        copied = list(conversation.messages.order_by("id"))
+        self.assertEqual(
+            [(m.sender, m.content, m.timestamp) for m in copied],
+            [(m.sender, m.content, m.timestamp) for m in self.messages],
+        )
+        self.assertEqual(copied[1].embedding_obj.embedding, [0.1, 0.2, 0.3])
+        self.assertFalse(MessageEmbedding.objects.filter(message=copied[0]).exists())
+
+    def test_summary_last_message_id_is_remapped(self):
+        imported = self.round_trip()
+
+        conversation = Conversation.objects.get(project=imported)
+        summary = conversation.summaries.get()
+        last_message = Message.objects.get(id=summary.last_message_id)
+        self.assertEqual(last_message.conversation, conversation)
+        self.assertEqual(last_message.content, "message 3")
+        self.assertEqual(summary.message_count, 4)
+
+    def test_summary_of_unexported_messages_loses_last_message_id(self):
+        imported = self.round_trip(message_filter=Q(id__gt=self.messages[3].id))
+
+        conversation = Conversation.objects.get(project=imported)
+        self.assertEqual(conversation.messages.count(), 2)
+        self.assertIsNone(conversation.summaries.get().last_message_id)
+
+    def test_invalid_export_leaves_nothing_behind(self):
+        lines = list(export_project(self.project))
+        lines.insert(3, '{"type": "unknown"}\n')
+
+        with self.assertRaises(ValueError):
+            import_project(lines, self.recipient)
+        self.assertFalse(Project.objects.filter(user=self.recipient).exists())
+
+    def test_missing_fields_are_rejected_before_anything_is_written(self):
+        lines = list(export_project(self.project))
+        message = json.loads(lines[-2])
+        del message["sender"]
+        lines[-2] = json.dumps(message) + "\n"
+
+        with self.assertRaisesRegex(ValueError, "missing field 'sender'"):
+            import_project(lines, self.recipient)
+        self.assertFalse(Project.objects.filter(user=self.recipient).exists())
+
+    def test_indexing_errors_do_not_fail_the_import(self):
+        # A file where the index directory should be
+        index_dir = tempfile.NamedTemporaryFile()
+        self.addCleanup(index_dir.close)
+        with override_settings(
+            EMBEDDING_INDEX_ENABLED=True, EMBEDDING_INDEX_DIR=index_dir.name
+        ):
+            imported = self.round_trip()
+        self.assertEqual(Conversation.objects.get(project=imported).messages.count(), 6)
+
+    def test_import_view(self):
+        client = APIClient()
+        client.force_authenticate(self.recipient)
+        lines = list(export_project(self.project))
+
+        response = client.post(
+            "/api/projects/import/",
+            "".join(lines),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["name"], "Weather station")
+        self.assertEqual(
+            response.data["created_at"],
+            self.project.created_at.isoformat().replace("+00:00", "Z"),
+        )
+
+        response = client.post(
+            "/api/projects/import/",
+            "".join(lines[:1] + ['{"type": "project"}\n']),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("missing field 'name'", response.data["error"])
+
+    def test_rejects_other_formats(self):
+        with self.assertRaises(ValueError):
+            import_project(['{"type": "header", "format": "other"}\n'], self.recipient)
+
+
+if __name__ == "__main__":
+    unittest.main()
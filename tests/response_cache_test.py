@@ -0,0 +1,145 @@
+import hashlib
+import types
+import unittest
+
+import django_setup  # noqa: F401
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from chat import ai_service, response_cache
+from chat.model_router import ROUTE_CACHE, ROUTE_FAST, ROUTE_PRIMARY
+from chat.models import CachedResponse, Conversation, Message, Project
+
+
+class FakeClient:
+    """Deterministic embeddings and canned completions instead of OpenAI."""
+
+    def __init__(self):
+        self.completions = []
+        self.chat = types.SimpleNamespace(
+            completions=types.SimpleNamespace(create=self.create)
+        )
+        self.embeddings = types.SimpleNamespace(create=self.embed)
+
+    def with_options(self, **kwargs):
+        return self
+
+    def create(self, model, messages, **kwargs):
+        self.completions.append(model)
+        message = types.SimpleNamespace(content=f"answer from {model}")
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=message)],
+            usage=types.SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+        )
+
+    def embed(self, input, model):
+        digest = hashlib.sha256(input.encode()).digest()
+        embedding = [byte / 255 for byte in digest]
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=embedding)])
+
+
+@override_settings(
+    RESPONSE_CACHE_ENABLED=True,
+    MODEL_ROUTER_FAST_MODEL="gpt-4o-mini",
+    MODEL_ROUTER_HEDGE_AFTER=0,
+)
+class TestResponseCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache._candidate_sets.clear()
+        self.user = User.objects.create_user("owner", password="x")
+        self.user.userprofile.default_query_model = "gpt-4o"
+        self.user.userprofile.save()
+        self.project = Project.objects.create(
+            user=self.user, name="Project", board_type="uno"
+        )
+        self.openai = FakeClient()
+        self.original_client = ai_service.client
+        ai_service.client = self.openai
+
+    def tearDown(self):
+        ai_service.client = self.original_client
+
+    def ask(self, question):
+        # A fresh conversation each time: only first questions are cacheable
+        conversation = Conversation.objects.create(project=self.project)
+        Message.objects.create(
+            conversation=conversation, sender="user", content=question
+        )
+        return ai_service.generate_response(question, conversation.id, self.user)
+
+    def test_routed_answer_is_served_from_the_cache(self):
+        text, tokens, route = self.ask("How do I blink an LED?")
+        self.assertEqual(route.route, ROUTE_FAST)
+
+        cached_text, cached_tokens, cached_route = self.ask("How do I blink an LED?")
+        self.assertEqual(cached_route.route, ROUTE_CACHE)
+        self.assertEqual(cached_route.model, "gpt-4o-mini")
+        self.assertEqual((cached_text, cached_tokens), (text, 0))
+        self.assertEqual(self.openai.completions.count("gpt-4o-mini"), 1)
+
+    def test_primary_answer_is_served_from_the_cache(self):
+        question = "How do I read a button? " + "Please explain. " * 20
+        self.assertEqual(self.ask(question)[2].route, ROUTE_PRIMARY)
+        self.assertEqual(self.ask(question)[2].route, ROUTE_CACHE)
+        self.assertEqual(self.openai.completions.count("gpt-4o"), 1)
+
+    def test_answers_are_not_shared_across_models(self):
+        self.ask("How do I blink an LED?")
+        with override_settings(MODEL_ROUTER_FAST_MODEL=""):
+            route = self.ask("How do I blink an LED?")[2]
+        self.assertEqual(route, (ROUTE_PRIMARY, "gpt-4o"))
+        self.assertEqual(CachedResponse.objects.count(), 2)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class TestLookupCachedResponse(TestCase):
+    def setUp(self):
+        # Test database IDs are reused between tests
+        response_cache._candidate_sets.clear()
+
+    def store(self, question, embedding):
+        return response_cache.store_cached_response(
+            question, embedding, "gpt-4o", "uno", f"answer to {question}"
+        )
+
+    def lookup(self, embedding, model="gpt-4o"):
+        return response_cache.lookup_cached_response(embedding, model, "uno")
+
+    def test_finds_answers_stored_after_earlier_lookups(self):
+        first = self.store("first", [1.0, 0.0, 0.0])
+        self.assertEqual(self.lookup([1.0, 0.0, 0.0]), first)
+
+        # E.g. stored by another worker
+        second = self.store("second", [0.0, 1.0, 0.0])
+        self.assertEqual(self.lookup([0.0, 1.0, 0.0]), second)
+        self.assertEqual(self.lookup([1.0, 0.0, 0.0]), first)
+        self.assertIsNone(self.lookup([0.0, 0.0, 1.0]))
+
+    def test_answers_are_partitioned_by_model(self):
+        self.store("first", [1.0, 0.0, 0.0])
+        self.assertIsNone(self.lookup([1.0, 0.0, 0.0], model="gpt-4o-mini"))
+
+    def test_expired_answers_are_not_served(self):
+        self.store("first", [1.0, 0.0, 0.0])
+        with override_settings(RESPONSE_CACHE_TTL=-60):
+            self.assertIsNone(self.lookup([1.0, 0.0, 0.0]))
+
+    def test_deleted_answers_are_not_served(self):
+        answer = self.store("first", [1.0, 0.0, 0.0])
+        self.assertEqual(self.lookup([1.0, 0.0, 0.0]), answer)
+        answer.delete()
+        self.assertIsNone(self.lookup([1.0, 0.0, 0.0]))
+
+    @override_settings(RESPONSE_CACHE_MAX_CANDIDATES=2)
+    def test_keeps_the_newest_candidates(self):
+        self.store("oldest", [1.0, 0.0, 0.0])
+        self.lookup([0.0, 0.0, 1.0])
+        newer = [self.store(f"newer {i}", [0.0, 1.0, float(i)]) for i in range(2)]
+        self.assertIsNone(self.lookup([1.0, 0.0, 0.0]))
+        self.assertEqual(self.lookup([0.0, 1.0, 1.0]), newer[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
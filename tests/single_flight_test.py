@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+
+import django_setup  # noqa: F401
+from django.core.cache import cache
+
+from chat.single_flight import get_result, run_once
+
+KEY = "test:single_flight"
+
+
+class TestRunOnce(unittest.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def func(self, value):
+        def run():
+            self.calls.append(value)
+            return value
+
+        return run
+
+    def run_in_thread(self, func, results):
+        thread = threading.Thread(
+            target=lambda: results.append(run_once(KEY, func, 60, 10))
+        )
+        thread.start()
+        return thread
+
+    def test_owner_runs_and_later_callers_replay(self):
+        self.assertEqual(run_once(KEY, self.func("first"), 60, 10), ("first", False))
+        self.assertEqual(run_once(KEY, self.func("second"), 60, 10), ("first", True))
+        self.assertEqual(self.calls, ["first"])
+        self.assertEqual(get_result(KEY), "first")
+
+    def test_waiter_gets_the_owners_result(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            self.calls.append("owner")
+            return "owner"
+
+        owner_results, waiter_results = [], []
+        owner = self.run_in_thread(slow, owner_results)
+        self.assertTrue(started.wait(5))
+        waiter = self.run_in_thread(self.func("waiter"), waiter_results)
+        # Let the waiter find the lock taken before the owner finishes
+        time.sleep(0.2)
+        release.set()
+        owner.join(5)
+        waiter.join(5)
+
+        self.assertEqual(owner_results, [("owner", False)])
+        self.assertEqual(waiter_results, [("owner", True)])
+        self.assertEqual(self.calls, ["owner"])
+
+    def test_waiter_takes_over_when_the_owner_fails(self):
+        started, release = threading.Event(), threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("owner failed")
+
+        def owner_target():
+            with self.assertRaises(RuntimeError):
+                run_once(KEY, failing, 60, 10)
+
+        owner = threading.Thread(target=owner_target)
+        owner.start()
+        self.assertTrue(started.wait(5))
+        waiter_results = []
+        waiter = self.run_in_thread(self.func("waiter"), waiter_results)
+        # Let the waiter find the lock taken before the owner finishes
+        time.sleep(0.2)
+        release.set()
+        owner.join(5)
+        waiter.join(5)
+
+        self.assertEqual(waiter_results, [("waiter", False)])
+        self.assertEqual(self.calls, ["waiter"])
+
+    def test_runs_anyway_when_the_lock_is_never_released(self):
+        cache.add(f"{KEY}:lock", "stuck", 60)
+        self.assertEqual(run_once(KEY, self.func("late"), 60, 0.2), ("late", False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+import django_setup  # noqa: F401
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chat.throttling import TokenBucketThrottle, limit_concurrency
+
+factory = APIRequestFactory()
+
+
+class ExampleThrottle(TokenBucketThrottle):
+    scope = "test"
+
+
+@api_view(["POST"])
+@throttle_classes([ExampleThrottle])
+def throttled_view(request):
+    return Response({"ok": True})
+
+
+@api_view(["POST"])
+@limit_concurrency("test")
+def limited_view(request):
+    # Lets a test act while the request holds its slot
+    while_running = getattr(request._request, "while_running", None)
+    if while_running:
+        while_running()
+    return Response({"ok": True})
+
+
+def post(view, user, while_running=None):
+    request = factory.post("/", {}, format="json")
+    request.while_running = while_running
+    force_authenticate(request, user=user)
+    return view(request)
+
+
+class ThrottlingTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        # Unsaved users are enough: only the primary key is used
+        self.user = User(pk=1, username="first")
+        self.other_user = User(pk=2, username="second")
+
+
+@override_settings(THROTTLE_RATES={"test": "2/min"})
+class TestTokenBucketThrottle(ThrottlingTestCase):
+    def test_rejects_requests_over_the_rate_with_retry_after(self):
+        self.assertEqual(post(throttled_view, self.user).status_code, 200)
+        self.assertEqual(post(throttled_view, self.user).status_code, 200)
+
+        response = post(throttled_view, self.user)
+        self.assertEqual(response.status_code, 429)
+        # One token refills every 30 seconds
+        self.assertTrue(0 < int(response["Retry-After"]) <= 30)
+
+    def test_buckets_are_per_user(self):
+        post(throttled_view, self.user)
+        post(throttled_view, self.user)
+        self.assertEqual(post(throttled_view, self.other_user).status_code, 200)
+
+    @override_settings(THROTTLE_RATES={"test": ""})
+    def test_empty_rate_disables_the_throttle(self):
+        for _ in range(5):
+            self.assertEqual(post(throttled_view, self.user).status_code, 200)
+
+
+@override_settings(CONCURRENCY_LIMITS={"test": 1}, CONCURRENCY_RETRY_AFTER=7)
+class TestLimitConcurrency(ThrottlingTestCase):
+    def test_rejects_requests_over_the_limit_with_retry_after(self):
+        nested = []
+        response = post(
+            limited_view,
+            self.user,
+            while_running=lambda: nested.append(post(limited_view, self.user)),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(nested[0].status_code, 429)
+        self.assertEqual(nested[0]["Retry-After"], "7")
+
+    def test_limit_is_per_user(self):
+        nested = []
+        post(
+            limited_view,
+            self.user,
+            while_running=lambda: nested.append(post(limited_view, self.other_user)),
+        )
+        self.assertEqual(nested[0].status_code, 200)
+
+    def test_slot_is_released_after_the_request(self):
+        self.assertEqual(post(limited_view, self.user).status_code, 200)
+        self.assertEqual(post(limited_view, self.user).status_code, 200)
+
+    def test_slot_is_released_when_the_view_fails(self):
+        def fail():
+            raise RuntimeError("view failed")
+
+        with self.assertRaises(RuntimeError):
+            post(limited_view, self.user, while_running=fail)
+        self.assertEqual(post(limited_view, self.user).status_code, 200)
+
+    def test_rejected_requests_release_their_slot_too(self):
+        post(
+            limited_view,
+            self.user,
+            while_running=lambda: post(limited_view, self.user),
+        )
+        self.assertEqual(post(limited_view, self.user).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()